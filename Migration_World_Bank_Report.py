@@ -2,10 +2,16 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import warnings
-from scipy.stats import zscore
+
+from anomalies import anomaly_scores
+from countries import add_iso3
+from stats_plots import box_figure, histogram_counts, histogram_figure, violin_figure
 
 df = pd.read_csv("data/pop_and_net_migration.csv")
 
+# Resolve country names to ISO3 once so the maps don't have to match names
+add_iso3(df, "Country")
+
 # df.sample(10)
 df.info()
 
@@ -127,8 +133,7 @@ df_sorted_by_years = df.sort_values(by="Year")
 
 fig_population_map = px.choropleth(
     df_sorted_by_years,
-    locations="Country",
-    locationmode="country names",
+    locations="ISO3",
     color="total_population",
     hover_name="Country",
     animation_frame="Year",
@@ -147,8 +152,7 @@ fig_population_map.show()
 
 fig_migration_map = px.choropleth(
     df_sorted_by_years,
-    locations="Country",
-    locationmode="country names",
+    locations="ISO3",
     color="net_migration",
     hover_name="Country",
     animation_frame="Year",
@@ -198,12 +202,13 @@ fig_bar.update_layout(
 
 fig_bar.show()
 
-fig_box = px.box(
+fig_box = box_figure(
     df,
+    "total_population",
     x="Year",
-    y="total_population",
     title="Box Plot: Distribution of Total Population by Year",
     labels={"total_population": "Total Population"},
+    template=None,
 )
 
 fig_box.update_layout(
@@ -214,12 +219,13 @@ fig_box.update_layout(
 
 fig_box.show()
 
-fig_box_migration = px.box(
+fig_box_migration = box_figure(
     df,
+    "net_migration",
     x="Year",
-    y="net_migration",
     title="Box Plot: Distribution of Net Migration by Year",
     labels={"net_migration": "Net Migration"},
+    template=None,
 )
 
 fig_box_migration.update_layout(
@@ -266,12 +272,12 @@ fig_scatter.update_layout(
 
 fig_scatter.show()
 
-fig_hist_population = px.histogram(
-    df,
-    x="total_population",
+fig_hist_population = histogram_figure(
+    *histogram_counts(df["total_population"], 40),
+    "total_population",
     title="Histogram: Distribution of Total Population",
     labels={"total_population": "Total Population"},
-    nbins=40, 
+    template=None,
 )
 
 fig_hist_population.update_layout(
@@ -297,15 +303,14 @@ fig_kde_population.update_layout(
 
 fig_kde_population.show()
 
-fig_violin_population = px.violin(
+fig_violin_population = violin_figure(
     df,
+    "total_population",
     x="Year",
-    y="total_population",
-    box=True,
-    points="all",
     color="Country",
     title="Violin Plot: Distribution of Total Population by Year",
     labels={"total_population": "Total Population", "Year": "Year"},
+    template=None,
 )
 
 fig_violin_population.update_layout(
@@ -317,12 +322,12 @@ fig_violin_population.update_layout(
 fig_violin_population.show()
 
 
-fig_hist_migration = px.histogram(
-    df,
-    x="net_migration",
+fig_hist_migration = histogram_figure(
+    *histogram_counts(df["net_migration"], 40),
+    "net_migration",
     title="Histogram: Distribution of Net Migration",
     labels={"net_migration": "Net Migration"},
-    nbins=40,
+    template=None,
 )
 
 fig_hist_migration.update_layout(
@@ -349,15 +354,14 @@ fig_kde_migration.update_layout(
 fig_kde_migration.show()
 
 
-fig_violin_migration = px.violin(
+fig_violin_migration = violin_figure(
     df,
+    "net_migration",
     x="Year",
-    y="net_migration",
-    box=True,
-    points="all",
     color="Country",
     title="Violin Plot: Distribution of Net Migration by Year",
     labels={"net_migration": "Net Migration", "Year": "Year"},
+    template=None,
 )
 
 fig_violin_migration.update_layout(
@@ -368,15 +372,14 @@ fig_violin_migration.update_layout(
 
 fig_violin_migration.show()
 
-fig_violin = px.violin(
+fig_violin = violin_figure(
     df,
-    y="net_migration",
+    "net_migration",
     x="Country",
     color="Country",
-    box=True,
-    points="all",
     title="Distribution of Net Migration across Countries",
     labels={"net_migration": "Net Migration"},
+    template=None,
 )
 
 fig_violin.update_layout(
@@ -565,12 +568,13 @@ fig_3d.update_layout(
 
 # fig_3d.show()
 
-fig_box = px.box(
+fig_box = box_figure(
     df,
-    y="total_population",
+    "total_population",
     color="Country",
     title="Box Plot of Total Population (Identifying Outliers)",
-    labels={"total_population": "Total Population"}
+    labels={"total_population": "Total Population"},
+    template=None,
 )
 
 fig_box.update_layout(
@@ -582,12 +586,13 @@ fig_box.update_layout(
 fig_box.show()
 
 
-fig_box_migration = px.box(
+fig_box_migration = box_figure(
     df,
-    y="net_migration",
+    "net_migration",
     color="Country",
     title="Box Plot of Net Migration (Identifying Outliers)",
-    labels={"net_migration": "Net Migration"}
+    labels={"net_migration": "Net Migration"},
+    template=None,
 )
 
 fig_box_migration.update_layout(
@@ -599,58 +604,20 @@ fig_box_migration.update_layout(
 fig_box_migration.show()
 
 
-df['z_total_population'] = zscore(df['total_population'])
-df['z_net_migration'] = zscore(df['net_migration'])
-
-outliers_population = df[df['z_total_population'].abs() > 3]
-outliers_migration = df[df['z_net_migration'].abs() > 3]
-
-fig_scatter_outliers = px.scatter(
-    df,
-    x="total_population",
-    y="net_migration",
-    color="Country",
-    title="Scatter Plot with Anomalies (Z-Score > 3)",
-    labels={"total_population": "Total Population", "net_migration": "Net Migration"}
-)
-
-fig_scatter_outliers.add_scatter(
-    x=outliers_population['total_population'],
-    y=outliers_population['net_migration'],
-    mode='markers',
-    marker=dict(color='red', size=12, symbol='x'),
-    name='Outliers (Population)'
-)
-
-fig_scatter_outliers.add_scatter(
-    x=outliers_migration['total_population'],
-    y=outliers_migration['net_migration'],
-    mode='markers',
-    marker=dict(color='yellow', size=12, symbol='x'),
-    name='Outliers (Migration)'
-)
-
-fig_scatter_outliers.update_layout(
-    plot_bgcolor="black",
-    paper_bgcolor="black",
-    font_color="white",
-)
-
-fig_scatter_outliers.show()
-
-
-df['z_total_population'] = zscore(df['total_population'])
-df['z_net_migration'] = zscore(df['net_migration'])
+# Unusual years within each country (rolling z-score, median/MAD score and
+# year-over-year jump), rather than one z-score over the pooled table
+population_scores = anomaly_scores(df, 'total_population')
+migration_scores = anomaly_scores(df, 'net_migration')
 
-outliers_population = df[df['z_total_population'].abs() > 3]
-outliers_migration = df[df['z_net_migration'].abs() > 3]
+outliers_population = df[population_scores['anomaly']]
+outliers_migration = df[migration_scores['anomaly']]
 
 fig_scatter_outliers = px.scatter(
     df,
     x="total_population",
     y="net_migration",
     color="Country",
-    title="Scatter Plot with Anomalies (Z-Score > 3)",
+    title="Scatter Plot with Per-Country Anomalies",
     labels={"total_population": "Total Population", "net_migration": "Net Migration"}
 )
 
@@ -0,0 +1,158 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from anomalies import anomaly_scores
+from countries import country_index
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+REFUGEE_COUNT = "Refugees under UNHCR's mandate"
+SLAVERY_COUNT = "Estimated number of people in modern slavery"
+SLAVERY_PREVALENCE = "Estimated prevalence of modern slavery per 1,000 population"
+
+# Derived tables the tab builders read, computed at most once per data snapshot
+AGGREGATES = {}
+
+
+aggregate_seconds = histogram("dashboard_aggregate_seconds", "Time to build a derived table.", ["aggregate"])
+
+
+def aggregate(name):
+    def register(build):
+        def timed(snapshot):
+            with aggregate_seconds.time(aggregate=name):
+                return build(snapshot)
+        AGGREGATES[name] = timed
+        return build
+    return register
+
+
+def get_aggregate(snapshot, name):
+    return snapshot.derived(("aggregate", name), AGGREGATES[name])
+
+
+def materialise(snapshot, names=None):
+    # Build every aggregate up front so no tab click pays for a scan
+    started = time.perf_counter()
+    for name in names or AGGREGATES:
+        get_aggregate(snapshot, name)
+    logger.info("Materialised aggregates for snapshot %d in %.3fs",
+                snapshot.version, time.perf_counter() - started)
+
+
+# Refugee aggregates
+@aggregate("refugee_total")
+def refugee_total(snapshot):
+    return snapshot.get("refugee_aggregates")["by_year"][REFUGEE_COUNT].sum()
+
+
+@aggregate("refugees_by_year")
+def refugees_by_year(snapshot):
+    return snapshot.get("refugee_aggregates")["by_year"].sort_values(by="Year")
+
+
+@aggregate("refugees_by_asylum")
+def refugees_by_asylum(snapshot):
+    return snapshot.get("refugee_aggregates")["by_asylum"]
+
+
+@aggregate("refugees_by_asylum_iso")
+def refugees_by_asylum_iso(snapshot):
+    # Host totals keyed by ISO3 for the choropleths, names kept for hover text
+    by_asylum = get_aggregate(snapshot, "refugees_by_asylum").copy()
+    by_asylum["Country of asylum (ISO)"] = country_index().iso3(by_asylum["Country of asylum"])
+    return by_asylum.dropna(subset=["Country of asylum (ISO)"])
+
+
+@aggregate("top_host_countries")
+def top_host_countries(snapshot):
+    return get_aggregate(snapshot, "refugees_by_asylum").sort_values(by=REFUGEE_COUNT, ascending=False).head(10)
+
+
+@aggregate("refugees_by_asylum_iso_year")
+def refugees_by_asylum_iso_year(snapshot):
+    # None when the extract has no ISO columns, the map falls back to country names
+    return snapshot.get("refugee_aggregates").get("by_asylum_iso_year")
+
+
+# Slavery aggregates
+@aggregate("slavery_total")
+def slavery_total(snapshot):
+    return snapshot.get("slavery")[SLAVERY_COUNT].sum()
+
+
+@aggregate("slavery_country_count")
+def slavery_country_count(snapshot):
+    return snapshot.get("slavery")["Country"].nunique()
+
+
+@aggregate("slavery_by_region")
+def slavery_by_region(snapshot):
+    return snapshot.get("slavery").groupby("Region", observed=True)[SLAVERY_COUNT].sum().reset_index()
+
+
+@aggregate("slavery_top10_prevalence")
+def slavery_top10_prevalence(snapshot):
+    return snapshot.get("slavery").nlargest(10, SLAVERY_PREVALENCE)
+
+
+# Migration aggregates
+@aggregate("migration_by_country")
+def migration_by_country(snapshot):
+    migration_data = snapshot.get("migration")
+    by_country = migration_data.groupby("Country", observed=True)["net_migration"].sum().reset_index()
+    return by_country.sort_values(by="net_migration", ascending=False)
+
+
+@aggregate("migration_anomalies")
+def migration_anomalies(snapshot):
+    # Rolling, robust and year-over-year scores of net migration within each country
+    return anomaly_scores(snapshot.get("migration"), "net_migration")
+
+
+@aggregate("migration_outliers")
+def migration_outliers(snapshot):
+    # Flagged country-years with their scores
+    scores = get_aggregate(snapshot, "migration_anomalies")
+    flagged = scores["anomaly"].to_numpy()
+    return snapshot.get("migration")[flagged].join(scores[flagged].drop(columns="anomaly"))
+
+
+# Cross-dataset aggregates
+@aggregate("unmatched_countries")
+def unmatched_countries(snapshot):
+    # Names each dataset uses that the country index can't resolve to ISO3
+    index = country_index()
+    return {
+        "slavery": index.unmatched(snapshot.get("slavery")["Country"]),
+        "migration": index.unmatched(snapshot.get("migration")["Country"]),
+        "refugees": index.unmatched(get_aggregate(snapshot, "refugees_by_asylum")["Country of asylum"]),
+    }
+
+
+@aggregate("country_positions")
+def country_positions(snapshot):
+    # Per dataset, an array from country key to row position: joins are O(1) per country
+    index = country_index()
+    latest_migration = snapshot.get("migration").sort_values("Year").drop_duplicates("ISO3", keep="last")
+    hosts = get_aggregate(snapshot, "refugees_by_asylum_iso")
+    return {
+        "slavery": (snapshot.get("slavery"), index.positions(index.keys(snapshot.get("slavery")["ISO3"]))),
+        "migration": (latest_migration, index.positions(index.keys(latest_migration["ISO3"]))),
+        "refugees": (hosts, index.positions(index.keys(hosts["Country of asylum (ISO)"]))),
+    }
+
+
+def country_rows(snapshot, iso3):
+    # The slavery, latest migration and refugee host rows for one country
+    key = country_index().key(iso3)
+    rows = {}
+    for dataset, (frame, positions) in get_aggregate(snapshot, "country_positions").items():
+        position = positions[key] if key >= 0 else -1
+        rows[dataset] = frame.iloc[position] if position >= 0 else None
+    return rows
+
@@ -1,46 +1,40 @@
-from flask import Flask, render_template
-from dash import Dash, dcc, html, Input, Output, callback
-import pandas as pd
-import plotly.express as px
+import json
+import logging
+import os
+import sys
+
+from flask import Flask, jsonify, render_template
+from dash import Dash, dcc, html, Input, Output, State, MATCH, Patch, ctx, no_update
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 import dash_bootstrap_components as dbc
-from scipy.stats import zscore
+from aggregates import SLAVERY_COUNT, SLAVERY_PREVALENCE, REFUGEE_COUNT, country_rows, get_aggregate, materialise
+from artifacts import ARTIFACTS_DIR, data_fingerprint, figure_settings, load_artifacts, write_artifacts
+from compression import compression_stats, init_compression
+from data_loader import load_stats
+from datasets import registry
+from downsample import downsample_frame, zoom_range
+from figure_cache import figure_cache
+from figure_slim import figure_to_json, slim_sizes
+from lazy_imports import LazyModule
+from metrics import gauge, histogram, init_metrics, BYTES_BUCKETS
+from stats_plots import box_figure, histogram_counts, histogram_figure
+
+# plotly.express is imported by the first figure built, not at startup
+px = LazyModule("plotly.express")
 
 # Initialize Flask app
 server = Flask(__name__)
+# gzip/brotli for pages, Dash layout and callback JSON
+init_compression(server)
+# Latency and payload histograms on /metrics, registered after compression so sizes are uncompressed
+init_metrics(server)
 
 # Initialize Dash app with a modern theme
+# Tab content is created by callbacks, so some callback targets aren't in the initial layout
 app = Dash(__name__, server=server, routes_pathname_prefix='/dash/', 
-           external_stylesheets=[dbc.themes.CYBORG, dbc.icons.BOOTSTRAP])
-
-# Load all datasets once
-slavery_data = pd.read_csv('./data/Global_Slavery_Index_2023.csv')
-migration_data = pd.read_csv('./data/pop_and_net_migration.csv')
-refugee_data = pd.read_csv('./data/United_Nations_Refugee_Data.csv')
-
-# Clean slavery data
-slavery_data.columns = slavery_data.columns.str.strip()
-# Fix: Corrected the str.replace() syntax
-slavery_data["Population"] = slavery_data["Population"].str.replace(",", "","-").astype(float)
-slavery_data["Estimated number of people in modern slavery"] = (
-    slavery_data["Estimated number of people in modern slavery"].str.replace(",", "").astype(float)
-)
-
-# Fill missing values
-slavery_data["Population"].fillna(slavery_data["Population"].median(), inplace=True)
-slavery_data["Estimated prevalence of modern slavery per 1,000 population"].fillna(
-    slavery_data["Estimated prevalence of modern slavery per 1,000 population"].median(), inplace=True
-)
-slavery_data["Estimated number of people in modern slavery"].fillna(
-    slavery_data["Estimated number of people in modern slavery"].median(), inplace=True
-)
-
-# Prepare migration data
-migration_data['population_growth_rate'] = migration_data.groupby('Country')['total_population'].pct_change() * 100
-migration_data['migration_rate'] = migration_data.groupby('Country')['net_migration'].pct_change() * 100
-migration_data['population_migration_ratio'] = migration_data['net_migration'] / migration_data['total_population']
-migration_data['z_total_population'] = zscore(migration_data['total_population'])
-migration_data['z_net_migration'] = zscore(migration_data['net_migration'])
+           external_stylesheets=[dbc.themes.CYBORG, dbc.icons.BOOTSTRAP],
+           suppress_callback_exceptions=True)
 
 # Navigation bar with War Analysis link added
 navbar = dbc.NavbarSimple(
@@ -98,11 +92,205 @@ app.layout = dbc.Container([
     ])
 ], fluid=True, className="pb-4")
 
+# Figure builders, registered by (tab, name) so each one can be cached on its own
+FIGURES = {}
+
+# Scatter and line charts with more points than this are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = int(os.environ.get("DASHBOARD_WEBGL_THRESHOLD", "1000"))
+figure_settings(webgl_threshold=WEBGL_THRESHOLD)
+
+
+# Downsampled time series whose builders take an x_range and are rebuilt at full
+# resolution when the user zooms in
+ZOOMABLE = set()
+
+
+def figure(tab, name, zoomable=False):
+    def register(build):
+        FIGURES[(tab, name)] = build
+        if zoomable:
+            ZOOMABLE.add((tab, name))
+        return build
+    return register
+
+
+def render_mode(frame, series=1):
+    # px render_mode for a frame plotted as `series` y columns
+    return "webgl" if len(frame) * series > WEBGL_THRESHOLD else "svg"
+
+
+def snapshot_histogram(snapshot, dataset, column, nbins, x_range=None):
+    # Full-range bins are computed once per snapshot, zoomed ranges are re-binned on demand
+    if x_range is not None:
+        return histogram_counts(snapshot.get(dataset)[column], nbins, x_range)
+    return snapshot.derived(("histogram", dataset, column, nbins),
+                            lambda snapshot: histogram_counts(snapshot.get(dataset)[column], nbins))
+
+
+figure_build_seconds = histogram("dashboard_figure_build_seconds", "Time to build a figure.", ["tab", "figure"])
+figure_serialize_seconds = histogram(
+    "dashboard_figure_serialize_seconds", "Time to slim and serialize a figure.", ["tab", "figure"])
+figure_bytes = histogram("dashboard_figure_bytes", "Serialized figure size.", ["tab", "figure"], BYTES_BUCKETS)
+gauge("dashboard_figure_slim_bytes", "Last sampled figure size before and after slimming.", slim_sizes,
+      labelname=("figure", "stage"))
+tab_seconds = histogram("dashboard_tab_seconds", "Time for update_tab to produce a tab.", ["tab"])
+
+
+def build_figure_json(snapshot, tab, name, **kwargs):
+    with figure_build_seconds.time(tab=tab, figure=name):
+        fig = FIGURES[(tab, name)](snapshot, **kwargs)
+        if "x_range" in kwargs:
+            fig.update_xaxes(range=list(kwargs["x_range"]), autorange=False)
+    with figure_serialize_seconds.time(tab=tab, figure=name):
+        payload = figure_to_json(fig, (tab, name))
+    figure_bytes.observe(len(payload), tab=tab, figure=name)
+    return payload
+
+
+def figure_json(snapshot, tab, name):
+    # Prefer the precomputed artifact when it was built from this data
+    artifacts = load_artifacts(snapshot)
+    payload = artifacts.figure(tab, name) if artifacts is not None else None
+    return payload or build_figure_json(snapshot, tab, name)
+
+
+def tab_figure(snapshot, tab, name):
+    # Reuse the serialized figure while the data snapshot stays the same
+    return figure_cache.get_or_build((tab, name, snapshot.version), lambda: figure_json(snapshot, tab, name))
+
+
+def zoomed_figure(snapshot, tab, name, x_range):
+    # Zoom ranges are arbitrary, so these bypass the figure cache and artifacts
+    return json.loads(build_figure_json(snapshot, tab, name, x_range=x_range))
+
+
+# A reload makes every cached figure stale
+registry.on_reload(figure_cache.clear)
+
+gauge("dashboard_snapshot_version", "Data snapshot this process serves.", lambda: registry.snapshot().version)
+gauge("dashboard_reloads", "Data reloads since start.", lambda: registry.reload_count, kind="counter")
+gauge("dashboard_figure_cache", "Figure cache size and hit counts.", figure_cache.stats, labelname="stat")
+gauge("dashboard_compression", "Compressed responses and bytes in and out.", lambda: dict(compression_stats),
+      labelname="stat", kind="counter")
+gauge("dashboard_dataset_cache_saved_seconds", "Load time the dataset cache saved at the last load, per dataset.",
+      lambda: {name: stats["saved_seconds"] for name, stats in load_stats.items()}, labelname="dataset")
+
+# Blank dark canvas shown until a graph's own callback delivers its figure
+PLACEHOLDER_FIGURE = {
+    "data": [],
+    "layout": {
+        "paper_bgcolor": "#111111",
+        "plot_bgcolor": "#111111",
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+    },
+}
+
+
+def tab_graph(tab, name):
+    # Tabs render these placeholders right away and each graph then fetches
+    # its own figure, so the browser loads them in parallel. Every Graph sends
+    # relayoutData when it mounts, so only zoomable ones get an id that listens to it.
+    graph_type = "zoom-graph" if (tab, name) in ZOOMABLE else "tab-graph"
+    return dcc.Loading(
+        dcc.Graph(id={"type": graph_type, "tab": tab, "name": name}, figure=PLACEHOLDER_FIGURE),
+        type="circle",
+    )
+
+
+@app.callback(
+    Output({"type": "tab-graph", "tab": MATCH, "name": MATCH}, "figure"),
+    Input({"type": "tab-graph", "tab": MATCH, "name": MATCH}, "id"),
+)
+def fill_graph(graph_id):
+    return tab_figure(registry.snapshot(), graph_id["tab"], graph_id["name"])
+
+
+@app.callback(
+    Output({"type": "zoom-graph", "tab": MATCH, "name": MATCH}, "figure"),
+    Input({"type": "zoom-graph", "tab": MATCH, "name": MATCH}, "id"),
+    Input({"type": "zoom-graph", "tab": MATCH, "name": MATCH}, "relayoutData"),
+)
+def fill_zoom_graph(graph_id, relayout):
+    snapshot = registry.snapshot()
+    tab, name = graph_id["tab"], graph_id["name"]
+    if not any(prop.endswith(".relayoutData") for prop in ctx.triggered_prop_ids):
+        return tab_figure(snapshot, tab, name)
+    x_range = zoom_range(relayout)
+    if x_range is not None:
+        return zoomed_figure(snapshot, tab, name, x_range)
+    if relayout.get("xaxis.autorange"):
+        # Zoomed back out: the cached downsampled overview
+        return tab_figure(snapshot, tab, name)
+    return no_update
+
+
+# Create world map with refugee distribution
+@figure("overview", "refugee_map")
+def overview_refugee_map(snapshot):
+    refugee_by_country = get_aggregate(snapshot, "refugees_by_asylum_iso")
+    return px.choropleth(refugee_by_country, 
+                         locations="Country of asylum (ISO)",
+                         hover_name="Country of asylum",
+                         color="Refugees under UNHCR's mandate",
+                         title="Global Refugee Distribution",
+                         color_continuous_scale="Blues",
+                         template="plotly_dark")
+
+
+# World map of slavery prevalence, shared by the overview and slavery tabs
+@figure("overview", "slavery_map")
+@figure("slavery", "map")
+def slavery_map(snapshot):
+    slavery_data = snapshot.get("slavery")
+    return px.choropleth(slavery_data, 
+                         locations="ISO3",
+                         hover_name="Country",
+                         color="Estimated prevalence of modern slavery per 1,000 population",
+                         title="Modern Slavery Prevalence per 1,000 Population",
+                         color_continuous_scale="Reds",
+                         template="plotly_dark")
+
+
+# Population vs Migration scatter, shared by the overview and migration tabs
+@figure("overview", "migration_chart")
+def migration_scatter(snapshot):
+    migration_data = snapshot.get("migration")
+    return px.scatter(migration_data,
+                      x="total_population", 
+                      y="net_migration",
+                      color="Country",
+                      size="Year",
+                      title="Population vs Net Migration",
+                      render_mode=render_mode(migration_data),
+                      template="plotly_dark")
+
+
+# The same scatter with each country's unusual years marked
+@figure("migration", "scatter")
+def migration_scatter_anomalies(snapshot):
+    fig = migration_scatter(snapshot)
+    outliers = get_aggregate(snapshot, "migration_outliers")
+    trace = go.Scattergl if render_mode(snapshot.get("migration")) == "webgl" else go.Scatter
+    fig.add_trace(trace(
+        x=outliers["total_population"],
+        y=outliers["net_migration"],
+        mode="markers",
+        marker=dict(color="red", size=12, symbol="x"),
+        name="Anomalies",
+        text=outliers["Country"],
+        customdata=outliers[["Year", "rolling_z", "robust", "jump"]].round(1),
+        hovertemplate="%{text} %{customdata[0]:.0f}<br>net_migration=%{y}<br>"
+                      "rolling z %{customdata[1]}, robust %{customdata[2]}, jump %{customdata[3]}<extra>anomaly</extra>",
+    ))
+    return fig
+
+
 # Overview dashboard
-def overview_dashboard():
+def overview_dashboard(snapshot):
     # Create cards with key stats
-    refugee_total = refugee_data["Refugees under UNHCR's mandate"].sum()
-    slavery_total = slavery_data["Estimated number of people in modern slavery"].sum()
+    refugee_total = get_aggregate(snapshot, "refugee_total")
+    slavery_total = get_aggregate(snapshot, "slavery_total")
     
     cards = dbc.Row([
         dbc.Col(dbc.Card([
@@ -122,38 +310,11 @@ def overview_dashboard():
         dbc.Col(dbc.Card([
             dbc.CardHeader("Countries Analyzed", className="text-center"),
             dbc.CardBody([
-                html.H2(f"{len(slavery_data['Country'].unique())}", className="text-center text-success"),
+                html.H2(f"{get_aggregate(snapshot, 'slavery_country_count')}", className="text-center text-success"),
             ])
         ], className="mb-4 shadow"), width=4),
     ])
     
-    # Create world map with refugee distribution
-    refugee_by_country = refugee_data.groupby("Country of asylum")["Refugees under UNHCR's mandate"].sum().reset_index()
-    refugee_map = px.choropleth(refugee_by_country, 
-                                locations="Country of asylum",
-                                locationmode="country names",
-                                color="Refugees under UNHCR's mandate",
-                                title="Global Refugee Distribution",
-                                color_continuous_scale="Blues",
-                                template="plotly_dark")
-    
-    # Create slavery prevalence map
-    slavery_map = px.choropleth(slavery_data, 
-                                locations="Country",
-                                locationmode="country names",
-                                color="Estimated prevalence of modern slavery per 1,000 population",
-                                title="Modern Slavery Prevalence per 1,000 Population",
-                                color_continuous_scale="Reds",
-                                template="plotly_dark")
-    
-    # Create migration trends visualization
-    migration_chart = px.scatter(migration_data,
-                               x="total_population", 
-                               y="net_migration",
-                               color="Country",
-                               size="Year",
-                               title="Population vs Net Migration",
-                               template="plotly_dark")
     
     # Add link to War Analysis page
     war_analysis_link = dbc.Row([
@@ -182,14 +343,55 @@ def overview_dashboard():
             ], className="mb-4 shadow"), width=12)
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=refugee_map), width=12, className="mb-4")
+            dbc.Col(tab_graph("overview", "refugee_map"), width=12, className="mb-4")
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=slavery_map), width=6),
-            dbc.Col(dcc.Graph(figure=migration_chart), width=6)
+            dbc.Col(html.Div(COUNTRY_PROFILE_HINT, id="country-profile"), width=12, className="mb-4")
+        ]),
+        dbc.Row([
+            dbc.Col(tab_graph("overview", "slavery_map"), width=6),
+            dbc.Col(tab_graph("overview", "migration_chart"), width=6)
         ])
     ])
     
+COUNTRY_PROFILE_HINT = html.P("Click a country on the map to compare its slavery, migration and refugee figures.",
+                              className="text-muted")
+
+
+def country_profile(snapshot, iso3):
+    # One country's row from each dataset, looked up by its ISO3 key
+    rows = country_rows(snapshot, iso3)
+    slavery, migration, refugees = rows["slavery"], rows["migration"], rows["refugees"]
+    name = next((row.iloc[0] for row in (slavery, migration, refugees) if row is not None), iso3)
+
+    def stat(label, row, column, template):
+        # NaN != NaN: a missing value in a matched row
+        value = "no data" if row is None or row[column] != row[column] else template.format(row[column])
+        return dbc.Col([html.Small(label, className="text-muted"), html.H5(value)], width=True)
+
+    return dbc.Card([
+        dbc.CardHeader(f"Country profile: {str(name).strip()}"),
+        dbc.CardBody(dbc.Row([
+            stat("Refugees hosted", refugees, REFUGEE_COUNT, "{:,.0f}"),
+            stat("People in modern slavery", slavery, SLAVERY_COUNT, "{:,.0f}"),
+            stat("Slavery prevalence per 1,000", slavery, SLAVERY_PREVALENCE, "{:.1f}"),
+            stat("Population" + (f" ({migration['Year']})" if migration is not None else ""),
+                 migration, "total_population", "{:,.0f}"),
+            stat("Net migration", migration, "net_migration", "{:+,.0f}"),
+        ])),
+    ], className="shadow")
+
+
+@app.callback(
+    Output("country-profile", "children"),
+    Input({"type": "tab-graph", "tab": "overview", "name": "refugee_map"}, "clickData"),
+    prevent_initial_call=True,
+)
+def show_country_profile(click):
+    if not click or not click.get("points"):
+        return no_update
+    return country_profile(registry.snapshot(), click["points"][0]["location"])
+    
     # Function to generate war analysis content with embedded Power BI
 def war_analysis_tab():
     return html.Div([
@@ -244,48 +446,80 @@ def war_analysis_tab():
     Input("tabs", "value")
 )
 def update_tab(tab_name):
+    # Hold on to one snapshot so a reload mid-callback can't mix data versions
+    snapshot = registry.snapshot()
+    with tab_seconds.time(tab=tab_name):
+        artifacts = load_artifacts(snapshot)
+        if artifacts is not None and artifacts.layout(tab_name) is not None:
+            return figure_cache.get_or_build(("layout", tab_name, snapshot.version), lambda: artifacts.layout(tab_name))
+        return render_tab(tab_name, snapshot)
+
+
+TABS = ["overview", "refugees", "migration", "slavery", "war"]
+
+
+def render_tab(tab_name, snapshot):
     if tab_name == "overview":
-        return overview_dashboard()
+        return overview_dashboard(snapshot)
     elif tab_name == "refugees":
-        return refugee_analysis()
+        return refugee_analysis(snapshot)
     elif tab_name == "migration":
-        return migration_analysis()
+        return migration_analysis(snapshot)
     elif tab_name == "slavery":
-        return slavery_analysis()
+        return slavery_analysis(snapshot)
     elif tab_name == "war":
-        return war_analysis_tab() 
+        return war_analysis_tab()
 
-# Function to generate refugee analysis content with improved visualizations
-def refugee_analysis():
-    # Refugee count by year
-    refugee_counts_by_year = refugee_data.groupby('Year')['Refugees under UNHCR\'s mandate'].sum().reset_index().sort_values(by='Year')
 
-    fig_trend = px.line(refugee_counts_by_year.sort_values('Year'), 
+def precompute(directory=ARTIFACTS_DIR):
+    # Render every figure and tab layout once so the server only reads files
+    snapshot = registry.snapshot()
+    materialise(snapshot)
+    figures = {key: figure_to_json(build(snapshot), key) for key, build in FIGURES.items()}
+    # The lazy refugee map's yearly figures, so moving the slider never runs Plotly either
+    for year in refugee_map_years(snapshot):
+        key = refugee_year_key(year)
+        figures[key] = figure_to_json(refugee_year_figure(snapshot, year), key)
+    layouts = {tab: json.dumps(render_tab(tab, snapshot), cls=PlotlyJSONEncoder) for tab in TABS}
+    write_artifacts(data_fingerprint(snapshot), figures, layouts, directory)
+
+# Refugee count by year
+@figure("refugees", "trend", zoomable=True)
+def refugee_trend(snapshot, x_range=None):
+    refugee_counts_by_year = downsample_frame(get_aggregate(snapshot, "refugees_by_year"), "Year",
+                                              ["Refugees under UNHCR's mandate"], x_range=x_range)
+
+    fig_trend = px.line(refugee_counts_by_year, 
                       x='Year', 
                       y='Refugees under UNHCR\'s mandate',
                       title='Global Refugee Trend Over Time',
+                      render_mode=render_mode(refugee_counts_by_year),
                       template="plotly_dark")
     fig_trend.update_traces(mode='lines+markers', line=dict(width=3))
-    
-    # Top host countries
-    top_host_countries = refugee_data.groupby('Country of asylum')['Refugees under UNHCR\'s mandate'].sum().reset_index()
-    top_host_countries = top_host_countries.sort_values(by='Refugees under UNHCR\'s mandate', ascending=False).head(10)
-    fig_top_countries = px.bar(top_host_countries, 
-                             x='Country of asylum', 
-                             y='Refugees under UNHCR\'s mandate',
-                             title='Top 10 Countries Hosting Refugees',
-                             color='Refugees under UNHCR\'s mandate',
-                             color_continuous_scale="Blues",
-                             template="plotly_dark")
-    
-    # Refugee map - Fix: Completely rewritten to avoid duplication and undefined variables
+    return fig_trend
+
+
+# Top host countries
+@figure("refugees", "top_countries")
+def refugee_top_countries(snapshot):
+    top_host_countries = get_aggregate(snapshot, "top_host_countries")
+    return px.bar(top_host_countries, 
+                  x='Country of asylum', 
+                  y='Refugees under UNHCR\'s mandate',
+                  title='Top 10 Countries Hosting Refugees',
+                  color='Refugees under UNHCR\'s mandate',
+                  color_continuous_scale="Blues",
+                  template="plotly_dark")
+
+
+# Refugee map - Fix: Completely rewritten to avoid duplication and undefined variables
+@figure("refugees", "map")
+def refugee_map(snapshot):
     fig_map = None
-    if 'Country of asylum (ISO)' in refugee_data.columns:
+    origin_destination_totals = get_aggregate(snapshot, "refugees_by_asylum_iso_year")
+    if origin_destination_totals is not None:
         # Get unique years for animation
-        years = sorted(refugee_data['Year'].unique())
-        
-        # Create origin-destination data
-        origin_destination_totals = refugee_data.groupby(['Country of asylum (ISO)', 'Year']).sum()["Refugees under UNHCR's mandate"].reset_index()
+        years = sorted(origin_destination_totals['Year'].unique())
         
         # Create animated map
         fig_map = px.choropleth(origin_destination_totals, 
@@ -321,15 +555,143 @@ def refugee_analysis():
         fig_map.layout.sliders[0].steps = slider_steps
     else:
         # Fallback if ISO codes aren't available
-        refugee_by_country = refugee_data.groupby("Country of asylum")["Refugees under UNHCR's mandate"].sum().reset_index()
+        refugee_by_country = get_aggregate(snapshot, "refugees_by_asylum_iso")
         fig_map = px.choropleth(refugee_by_country, 
-                              locations="Country of asylum",
-                              locationmode="country names",
+                              locations="Country of asylum (ISO)",
+                              hover_name="Country of asylum",
                               color="Refugees under UNHCR's mandate",
                               title="Global Refugee Distribution",
                               color_continuous_scale="Blues",
                               template="plotly_dark")
-    
+    return fig_map
+
+
+# "lazy" ships one year of the refugee map at a time and fetches the others as the
+# slider moves, "animated" sends every yearly frame up front
+REFUGEE_MAP_MODE = os.environ.get("DASHBOARD_REFUGEE_MAP_MODE", "lazy")
+figure_settings(refugee_map_mode=REFUGEE_MAP_MODE)
+
+
+def refugee_year_frame(snapshot, year):
+    # One year's locations and counts, cached per snapshot
+    def build(snapshot):
+        totals = get_aggregate(snapshot, "refugees_by_asylum_iso_year")
+        rows = totals[totals['Year'] == year]
+        return {
+            "locations": rows['Country of asylum (ISO)'].astype(str).tolist(),
+            "z": rows['Refugees under UNHCR\'s mandate'].tolist(),
+        }
+    return snapshot.derived(("refugee_map_year", year), build)
+
+
+def refugee_map_years(snapshot):
+    # Years the lazy refugee map offers, none when it falls back to the single map
+    totals = get_aggregate(snapshot, "refugees_by_asylum_iso_year")
+    if REFUGEE_MAP_MODE != "lazy" or totals is None:
+        return []
+    return sorted(int(year) for year in totals['Year'].unique())
+
+
+def refugee_year_key(year):
+    return ("refugees", f"map_{year}")
+
+
+def refugee_year_figure_dict(snapshot, year):
+    # One year's full map, read from the artifacts when they have it
+    key = refugee_year_key(year)
+
+    def build():
+        artifacts = load_artifacts(snapshot)
+        payload = artifacts.figure(*key) if artifacts is not None else None
+        return payload if payload is not None else figure_to_json(refugee_year_figure(snapshot, year), key)
+    return figure_cache.get_or_build(key + (snapshot.version,), build)
+
+
+def refugee_year_figure(snapshot, year):
+    totals = get_aggregate(snapshot, "refugees_by_asylum_iso_year")
+    frame = refugee_year_frame(snapshot, year)
+    # Fix the colour range across years so the map stays comparable while playing
+    return px.choropleth(locations=frame["locations"],
+                         color=frame["z"],
+                         range_color=(0, totals['Refugees under UNHCR\'s mandate'].max()),
+                         labels={'locations': 'Country of asylum (ISO)', 'color': 'Refugees under UNHCR\'s mandate'},
+                         title=f'Refugee Distribution in {year}',
+                         color_continuous_scale='Blues',
+                         template="plotly_dark")
+
+
+def refugee_map_panel(snapshot):
+    years = refugee_map_years(snapshot)
+    if not years:
+        return tab_graph("refugees", "map")
+
+    return html.Div([
+        dcc.Loading(dcc.Graph(id="refugee-map-graph", figure=PLACEHOLDER_FIGURE), type="circle"),
+        dbc.Row([
+            dbc.Col(dbc.Button("Play", id="refugee-map-play", n_clicks=0, color="primary", size="sm"), width="auto"),
+            dbc.Col(dcc.Slider(
+                id="refugee-map-year",
+                min=years[0],
+                max=years[-1],
+                step=None,
+                value=years[-1],
+                marks={year: str(year) if i % 5 == 0 or year == years[-1] else "" for i, year in enumerate(years)},
+            )),
+        ], align="center"),
+        dcc.Interval(id="refugee-map-interval", interval=1000, disabled=True),
+    ])
+
+
+@app.callback(
+    Output("refugee-map-graph", "figure"),
+    Input("refugee-map-year", "value"),
+)
+def show_refugee_year(year):
+    snapshot = registry.snapshot()
+    if ctx.triggered_id is None:
+        # First paint sends the whole figure, later years only swap the trace data
+        return refugee_year_figure_dict(snapshot, year)
+    artifacts = load_artifacts(snapshot)
+    if artifacts is not None and artifacts.figure(*refugee_year_key(year)) is not None:
+        # Prebuilt: take the year's trace data straight from its figure
+        trace = refugee_year_figure_dict(snapshot, year)["data"][0]
+        frame = {"locations": trace["locations"], "z": trace["z"]}
+    else:
+        frame = refugee_year_frame(snapshot, year)
+    patch = Patch()
+    patch["data"][0]["locations"] = frame["locations"]
+    patch["data"][0]["z"] = frame["z"]
+    patch["layout"]["title"]["text"] = f"Refugee Distribution in {year}"
+    return patch
+
+
+@app.callback(
+    Output("refugee-map-interval", "disabled"),
+    Output("refugee-map-play", "children"),
+    Input("refugee-map-play", "n_clicks"),
+    prevent_initial_call=True,
+)
+def toggle_refugee_playback(n_clicks):
+    playing = n_clicks % 2 == 1
+    return not playing, "Pause" if playing else "Play"
+
+
+@app.callback(
+    Output("refugee-map-year", "value"),
+    Input("refugee-map-interval", "n_intervals"),
+    State("refugee-map-year", "value"),
+    State("refugee-map-year", "marks"),
+    prevent_initial_call=True,
+)
+def advance_refugee_year(n_intervals, year, marks):
+    # Step to the next year that has data, wrapping around at the end
+    years = sorted(int(mark) for mark in marks)
+    later = [y for y in years if y > year]
+    return later[0] if later else years[0]
+
+
+# Function to generate refugee analysis content with improved visualizations
+def refugee_analysis(snapshot):
     # Add War Analysis link in the refugee section
     war_link = dbc.Row([
         dbc.Col(dbc.Card([
@@ -354,115 +716,115 @@ def refugee_analysis():
         ]),
         war_link,  # Add War Analysis link
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_trend), width=12, className="mb-4")
+            dbc.Col(tab_graph("refugees", "trend"), width=12, className="mb-4")
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_top_countries), width=6),
-            dbc.Col(dcc.Graph(figure=fig_map), width=6)
+            dbc.Col(tab_graph("refugees", "top_countries"), width=6),
+            dbc.Col(refugee_map_panel(snapshot), width=6)
         ])
     ])
 
-# Function to generate migration analysis content with improved visualizations
-def migration_analysis():
-    # Migration over time
-    fig_line = px.line(migration_data,
-                      x="Year",
-                      y=["total_population", "net_migration"],
-                      title="Total Population vs Net Migration Over Time",
+# Migration over time
+@figure("migration", "line", zoomable=True)
+def migration_line(snapshot, x_range=None):
+    migration_data = downsample_frame(snapshot.get("migration"), "Year",
+                                      ["total_population", "net_migration"], x_range=x_range, by="Country")
+    return px.line(migration_data,
+                   x="Year",
+                   y=["total_population", "net_migration"],
+                   title="Total Population vs Net Migration Over Time",
+                   render_mode=render_mode(migration_data, series=2),
+                   template="plotly_dark")
+
+
+# Migration rate by country
+@figure("migration", "bar")
+def migration_bar(snapshot):
+    migration_by_country = get_aggregate(snapshot, "migration_by_country")
+    return px.bar(migration_by_country.head(10),
+                  x='Country',
+                  y='net_migration',
+                  title='Top 10 Countries by Net Migration',
+                  color='net_migration',
+                  color_continuous_scale="RdBu",
+                  template="plotly_dark")
+
+
+@figure("migration", "box")
+def migration_box(snapshot):
+    migration_data = snapshot.get("migration")
+    return box_figure(migration_data,
+                      "net_migration",
+                      color="Country",
+                      title="Net Migration Distribution by Country",
                       template="plotly_dark")
-    
-    # Population vs Migration scatter
-    fig_scatter = px.scatter(migration_data,
-                            x="total_population",
-                            y="net_migration",
-                            color="Country",
-                            size="Year",
-                            title="Population vs Net Migration",
-                            template="plotly_dark")
-    
-    # Migration rate by country
-    migration_by_country = migration_data.groupby('Country')['net_migration'].sum().reset_index()
-    migration_by_country = migration_by_country.sort_values(by='net_migration', ascending=False)
-    
-    fig_bar = px.bar(migration_by_country.head(10),
-                    x='Country',
-                    y='net_migration',
-                    title='Top 10 Countries by Net Migration',
-                    color='net_migration',
-                    color_continuous_scale="RdBu",
-                    template="plotly_dark")
-    
-    # Identify outliers in migration patterns
-    outliers = migration_data[migration_data['z_net_migration'].abs() > 3]
-    
-    fig_box = px.box(migration_data,
-                    y="net_migration",
-                    color="Country",
-                    title="Net Migration Distribution by Country",
-                    template="plotly_dark")
-    
+
+
+# Function to generate migration analysis content with improved visualizations
+def migration_analysis(snapshot):
     return html.Div([
         dbc.Row([
             dbc.Col([
                 dbc.Card([
                     dbc.CardHeader("Migration Analysis"),
                     dbc.CardBody([
-                        html.P("This section explores global migration patterns, showing the relationship between population and migration, trends over time, and identifying outliers.")
+                        html.P("This section explores global migration patterns, showing the relationship between population and migration, trends over time, and marking each country's unusual years: red crosses are years where at least two of three checks agree: far from the country's recent trend, from its typical level, or from its typical year-over-year change.")
                     ])
                 ], className="mb-4 shadow")
             ], width=12)
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_line), width=12, className="mb-4")
+            dbc.Col(tab_graph("migration", "line"), width=12, className="mb-4")
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_scatter), width=6),
-            dbc.Col(dcc.Graph(figure=fig_bar), width=6)
+            dbc.Col(tab_graph("migration", "scatter"), width=6),
+            dbc.Col(tab_graph("migration", "bar"), width=6)
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_box), width=12)
+            dbc.Col(tab_graph("migration", "box"), width=12)
         ])
     ])
 
+# Distribution of slavery prevalence
+@figure("slavery", "hist", zoomable=True)
+def slavery_hist(snapshot, x_range=None):
+    column = "Estimated prevalence of modern slavery per 1,000 population"
+    counts, edges = snapshot_histogram(snapshot, "slavery", column, 20, x_range)
+    return histogram_figure(counts, edges,
+                            column,
+                            title="Distribution of Modern Slavery Prevalence",
+                            template="plotly_dark")
+
+
+# Regional aggregation
+@figure("slavery", "bar")
+def slavery_bar(snapshot):
+    total_by_region = get_aggregate(snapshot, "slavery_by_region")
+    return px.bar(total_by_region,
+                  x='Region',
+                  y='Estimated number of people in modern slavery',
+                  title='Modern Slavery by Region',
+                  color='Estimated number of people in modern slavery',
+                  color_continuous_scale="Reds",
+                  template="plotly_dark")
+
+
+# Top 10 countries with highest prevalence
+@figure("slavery", "top10")
+def slavery_top10(snapshot):
+    top_10_prevalence = get_aggregate(snapshot, "slavery_top10_prevalence")
+    return px.bar(top_10_prevalence,
+                  y='Country',
+                  x='Estimated prevalence of modern slavery per 1,000 population',
+                  title='Top 10 Countries with Highest Modern Slavery Prevalence',
+                  orientation='h',
+                  color='Estimated prevalence of modern slavery per 1,000 population',
+                  color_continuous_scale="Reds",
+                  template="plotly_dark")
+
+
 # Function to generate slavery analysis content with improved visualizations
-def slavery_analysis():
-    # Distribution of slavery prevalence
-    fig_hist = px.histogram(slavery_data, 
-                          x="Estimated prevalence of modern slavery per 1,000 population",
-                          title="Distribution of Modern Slavery Prevalence",
-                          nbins=20,
-                          template="plotly_dark")
-    
-    # Regional aggregation
-    total_by_region = slavery_data.groupby("Region")["Estimated number of people in modern slavery"].sum().reset_index()
-    fig_bar = px.bar(total_by_region,
-                    x='Region',
-                    y='Estimated number of people in modern slavery',
-                    title='Modern Slavery by Region',
-                    color='Estimated number of people in modern slavery',
-                    color_continuous_scale="Reds",
-                    template="plotly_dark")
-    
-    # Top 10 countries with highest prevalence
-    top_10_prevalence = slavery_data.nlargest(10, "Estimated prevalence of modern slavery per 1,000 population")
-    fig_top10 = px.bar(top_10_prevalence,
-                      y='Country',
-                      x='Estimated prevalence of modern slavery per 1,000 population',
-                      title='Top 10 Countries with Highest Modern Slavery Prevalence',
-                      orientation='h',
-                      color='Estimated prevalence of modern slavery per 1,000 population',
-                      color_continuous_scale="Reds",
-                      template="plotly_dark")
-    
-    # World map of slavery prevalence
-    fig_map = px.choropleth(slavery_data,
-                           locations="Country",
-                           locationmode="country names",
-                           color="Estimated prevalence of modern slavery per 1,000 population",
-                           title="Modern Slavery Prevalence per 1,000 Population",
-                           color_continuous_scale="Reds",
-                           template="plotly_dark")
-    
+def slavery_analysis(snapshot):
     # Add War Analysis link in the slavery section
     war_link = dbc.Row([
         dbc.Col(dbc.Card([
@@ -487,14 +849,14 @@ def slavery_analysis():
         ]),
         war_link,  # Add War Analysis link
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_map), width=12, className="mb-4")
+            dbc.Col(tab_graph("slavery", "map"), width=12, className="mb-4")
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_bar), width=6),
-            dbc.Col(dcc.Graph(figure=fig_top10), width=6)
+            dbc.Col(tab_graph("slavery", "bar"), width=6),
+            dbc.Col(tab_graph("slavery", "top10"), width=6)
         ]),
         dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_hist), width=12)
+            dbc.Col(tab_graph("slavery", "hist"), width=12)
         ])
     ])
 
@@ -508,5 +870,30 @@ def index():
 def war_analysis():
     return render_template('war-analysis.html')
 
+# Liveness and data version for load balancers and deploy checks
+@server.route('/health')
+def health():
+    snapshot = registry.snapshot()
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "snapshot": snapshot.version,
+        "fingerprint": data_fingerprint(snapshot),
+        "loaded": [name for name in snapshot.names() if snapshot.is_loaded(name)],
+        "reloads": registry.reload_count,
+        "last_reload_seconds": registry.last_reload_seconds,
+        "figure_cache": figure_cache.stats(),
+    })
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    # python -m app precompute [directory]
+    if sys.argv[1:2] == ["precompute"]:
+        precompute(*sys.argv[2:3])
+        sys.exit(0)
+    # Build the derived tables once now and again after every reload
+    materialise(registry.snapshot())
+    registry.on_reload(materialise)
+    # Pick up new extracts dropped into ./data without restarting
+    registry.watch()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import pyarrow as pa
+
+from data_loader import CACHE_DIR, CACHE_FORMAT
+from datasets import SERVED
+
+logger = logging.getLogger(__name__)
+
+# Published datasets as uncompressed Arrow IPC files. One process parses the CSVs
+# and writes them, every other process memory-maps them read-only, so the column
+# data lives once in the page cache instead of once per worker.
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots"))
+MANIFEST = "current.json"
+# Name of the only part of a dataset that is a single frame
+FRAME = "frame"
+
+
+def to_table(frame):
+    table = pa.Table.from_pandas(frame)
+    # Arrow would turn NaN into nulls, and nulls have to be copied back into NaN
+    # on read. Kept as plain float values the column maps without a copy.
+    for position, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and field.name in frame.columns:
+            table = table.set_column(position, field, pa.array(frame[field.name].to_numpy(), from_pandas=False))
+    return table
+
+
+def write_table(frame, path):
+    table = to_table(frame)
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+
+
+def map_table(path):
+    # Numeric columns and categorical codes point straight into the mapping and
+    # are read-only. The file can be replaced or deleted while mapped.
+    source = pa.memory_map(path, "r")
+    return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+
+class SnapshotStore:
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self.manifest = None
+        self._manifest_mtime = None
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, snapshot):
+        # Write the snapshot's datasets and switch the manifest to them. Datasets
+        # whose source didn't change keep pointing at the files already published.
+        started = time.perf_counter()
+        previous = (self._read_manifest() or {}).get("datasets", {})
+        folder = f"{snapshot.version:06d}-{time.time_ns()}"
+        datasets = {}
+        for name in snapshot.names():
+            stamp = snapshot.stamps.get(name)
+            # Datasets the current ingest mode never reads aren't loaded just to publish them
+            if stamp is None or name not in SERVED:
+                continue
+            key = [CACHE_FORMAT, *stamp]
+            if previous.get(name, {}).get("key") == key:
+                datasets[name] = previous[name]
+                continue
+            value = snapshot.get(name)
+            parts = value if isinstance(value, dict) else {FRAME: value}
+            os.makedirs(os.path.join(self.directory, folder), exist_ok=True)
+            files = {}
+            for part, frame in parts.items():
+                files[part] = os.path.join(folder, f"{name}.{part}.arrow")
+                write_table(frame, os.path.join(self.directory, files[part]))
+            datasets[name] = {"key": key, "kind": "parts" if isinstance(value, dict) else FRAME, "files": files}
+
+        manifest = {"version": snapshot.version, "datasets": datasets}
+        path = self._manifest_path()
+        with open(path + ".tmp", "w") as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(path + ".tmp", path)
+        self._prune(manifest)
+        logger.info("Published snapshot %d to %s in %.3fs", snapshot.version, self.directory,
+                    time.perf_counter() - started)
+        return manifest
+
+    def _prune(self, manifest):
+        # Processes still mapping a removed file keep their mapping, so only the
+        # folders the new manifest uses are kept
+        used = {path.split(os.sep)[0] for entry in manifest["datasets"].values() for path in entry["files"].values()}
+        for folder in os.listdir(self.directory):
+            full = os.path.join(self.directory, folder)
+            if os.path.isdir(full) and folder not in used:
+                shutil.rmtree(full, ignore_errors=True)
+
+    def refresh(self):
+        # Re-read the manifest if it changed, returning the datasets it now maps differently
+        try:
+            mtime = os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime == self._manifest_mtime:
+            return []
+        manifest = self._read_manifest()
+        if manifest is None:
+            return []
+        previous = (self.manifest or {}).get("datasets", {})
+        self.manifest, self._manifest_mtime = manifest, mtime
+        return [name for name, entry in manifest["datasets"].items() if previous.get(name) != entry]
+
+    def load(self, name):
+        entry = self.manifest["datasets"][name]
+        parts = {part: map_table(os.path.join(self.directory, path)) for part, path in entry["files"].items()}
+        return parts[FRAME] if entry["kind"] == FRAME else parts
+
+    def attach(self, registry):
+        # From now on the registry maps the published files instead of parsing CSVs
+        self.refresh()
+        for name in self.manifest["datasets"]:
+            registry.register(name, lambda snapshot, name=name: self.load(name), source=registry.source(name))
+
+    def follow(self, registry, interval):
+        # Poll the manifest and swap in a new registry snapshot when it moves
+        def loop():
+            while True:
+                time.sleep(interval)
+                previous = self.manifest, self._manifest_mtime
+                changed = self.refresh()
+                if changed:
+                    try:
+                        registry.reload(changed)
+                    except Exception:
+                        logger.exception("Mapping published snapshot %s failed", self.manifest.get("version"))
+                        # A newer publish may have pruned the folder this manifest named.
+                        # Forget it so the next poll re-reads the manifest and retries.
+                        self.manifest, self._manifest_mtime = previous
+
+        threading.Thread(target=loop, daemon=True).start()
+
+
+def start_publisher(store, registry, interval):
+    # Fork a process that watches the CSVs with the registry's parsing loaders and
+    # publishes every reload. It exits when its parent does.
+    pid = os.fork()
+    if pid:
+        return pid
+    try:
+        parent = os.getppid()
+        registry.on_reload(store.publish)
+        registry.watch(interval)
+        while os.getppid() == parent:
+            time.sleep(interval)
+    except Exception:
+        logger.exception("Snapshot publisher stopped")
+    finally:
+        os._exit(0)
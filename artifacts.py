@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+from importlib import metadata
+
+import anomalies
+import downsample
+import figure_slim
+from data_loader import SOURCES, file_sha256, source_path
+
+logger = logging.getLogger(__name__)
+
+# Prebuilt figure and layout JSON written by `python -m app precompute`
+ARTIFACTS_DIR = os.environ.get("DASHBOARD_ARTIFACTS_DIR", "./artifacts")
+
+# Bump when the artifact files themselves change shape
+ARTIFACT_FORMAT = 2
+
+# Everything that shapes a figure or a tab layout. Its content and the plotting
+# library versions are part of the fingerprint, so artifacts built by other code
+# never match, whether or not anyone remembered to bump ARTIFACT_FORMAT.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CODE_FILES = ["app.py", "aggregates.py", "anomalies.py", "countries.py", "data_loader.py",
+              "downsample.py", "figure_slim.py", "stats_plots.py", "data/country_codes.csv"]
+CODE_PACKAGES = ["dash", "dash-bootstrap-components", "plotly", "pandas", "numpy"]
+
+# DASHBOARD_* settings that change what a stored figure or layout contains, as
+# resolved at import. app.py adds its own with figure_settings().
+FIGURE_SETTINGS = {
+    "anomaly_window": anomalies.WINDOW,
+    "anomaly_agree": anomalies.AGREE,
+    "chart_width": downsample.CHART_WIDTH,
+    "point_budget": downsample.POINT_BUDGET,
+    "slim_figures": figure_slim.SLIM_FIGURES,
+    "display_digits": figure_slim.DISPLAY_DIGITS,
+    "typed_arrays": figure_slim.TYPED_ARRAYS,
+    "typed_array_min_length": figure_slim.TYPED_ARRAY_MIN_LENGTH,
+}
+
+_code_fingerprint = None
+
+
+def figure_settings(**settings):
+    FIGURE_SETTINGS.update(settings)
+
+
+def code_fingerprint():
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        digest = hashlib.sha256()
+        for name in CODE_FILES:
+            path = os.path.join(ROOT, name)
+            digest.update(name.encode())
+            digest.update(file_sha256(path).encode() if os.path.exists(path) else b"missing")
+        for package in CODE_PACKAGES:
+            try:
+                version = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                version = "missing"
+            digest.update(f"{package}={version}".encode())
+        _code_fingerprint = digest.hexdigest()
+    return _code_fingerprint
+
+
+def data_fingerprint(snapshot):
+    # Content hash of every source CSV and of the code and settings that render
+    # them, stable across copies and checkouts
+    def build(snapshot):
+        digest = hashlib.sha256(f"format={ARTIFACT_FORMAT}".encode())
+        digest.update(code_fingerprint().encode())
+        digest.update(json.dumps(FIGURE_SETTINGS, sort_keys=True).encode())
+        for source in sorted(SOURCES):
+            path = source_path(source)
+            digest.update(source.encode())
+            digest.update(file_sha256(path).encode() if os.path.exists(path) else b"missing")
+        return digest.hexdigest()
+    return snapshot.derived("fingerprint", build)
+
+
+class Artifacts:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _read(self, *parts):
+        try:
+            with open(os.path.join(self.directory, *parts)) as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def figure(self, tab, name):
+        return self._read("figures", tab, name + ".json")
+
+    def layout(self, tab):
+        return self._read("layouts", tab + ".json")
+
+
+def load_artifacts(snapshot, directory=ARTIFACTS_DIR):
+    # The artifacts for this snapshot, or None when missing or built from other data
+    def build(snapshot):
+        try:
+            with open(os.path.join(directory, "manifest.json")) as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("fingerprint") != data_fingerprint(snapshot):
+            settings = manifest.get("settings", {})
+            differ = sorted(name for name in FIGURE_SETTINGS if settings.get(name) != FIGURE_SETTINGS[name])
+            if differ:
+                logger.warning("Ignoring artifacts in %s built with other settings: %s",
+                               directory, ", ".join(f"{name}={settings.get(name)!r}" for name in differ))
+            else:
+                logger.info("Ignoring stale artifacts in %s", directory)
+            return None
+        return Artifacts(os.path.join(directory, manifest["fingerprint"]))
+    return snapshot.derived(("artifacts", directory), build)
+
+
+def _write(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as handle:
+        handle.write(payload)
+    os.replace(path + ".tmp", path)
+
+
+def write_artifacts(fingerprint, figures, layouts, directory=ARTIFACTS_DIR):
+    # Each data version gets its own folder and the manifest is switched last,
+    # so a running server never reads a mix of old and new files
+    target = os.path.join(directory, fingerprint)
+    for (tab, name), payload in figures.items():
+        _write(os.path.join(target, "figures", tab, name + ".json"), payload)
+    for tab, payload in layouts.items():
+        _write(os.path.join(target, "layouts", tab + ".json"), payload)
+    _write(os.path.join(directory, "manifest.json"), json.dumps({
+        "fingerprint": fingerprint,
+        "settings": FIGURE_SETTINGS,
+        "figures": sorted(f"{tab}/{name}" for tab, name in figures),
+        "layouts": sorted(layouts),
+    }, indent=2))
+    logger.info("Wrote %d figures and %d layouts to %s", len(figures), len(layouts), target)
@@ -0,0 +1,345 @@
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks.run import REFUGEE_MAP_CALLBACK, ROOT, TAB_CALLBACK, _components, graph_callback
+
+# Replays browser-like traffic against a dashboard server and reports latency
+# percentiles, errors, bytes on the wire and CPU per server process:
+#
+#   python -m benchmarks.loadtest --users 20 --duration 60                  # starts serve.py
+#   python -m benchmarks.loadtest --server werkzeug --users 5
+#   python -m benchmarks.loadtest --url http://127.0.0.1:8000 --pid 1234    # already running
+#
+# Every simulated user loads the page and the Dash bootstrap requests once, then
+# clicks tabs picked from --mix, each click followed by the graph callbacks the
+# tab mounts, sent concurrently over up to --connections connections the way the
+# browser fires them.
+
+DEFAULT_MIX = "overview=4,refugees=2,migration=2,slavery=2,war=1"
+# Parallel connections per host that browsers open
+BROWSER_CONNECTIONS = 6
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        tab, _, weight = part.partition("=")
+        mix[tab.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.clicks = {}
+        self.errors = {}
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds, size, error=None):
+        with self._lock:
+            self.samples.setdefault(kind, []).append(seconds)
+            self.bytes += size
+            if error is not None:
+                self.errors.setdefault(kind, {}).setdefault(error, 0)
+                self.errors[kind][error] += 1
+
+    def record_click(self, tab, seconds):
+        # A whole click: the tab callback and all of its graph callbacks
+        with self._lock:
+            self.clicks.setdefault(tab, []).append(seconds)
+
+    def summary(self, elapsed):
+        def stats(values):
+            return {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p99": percentile(values, 0.99),
+                "max": max(values) if values else None,
+                "mean": sum(values) / len(values) if values else None,
+            }
+
+        everything = [value for values in self.samples.values() for value in values]
+        return {
+            "requests": len(everything),
+            "throughput_rps": len(everything) / elapsed if elapsed else None,
+            "bytes": self.bytes,
+            "errors": sum(count for kinds in self.errors.values() for count in kinds.values()),
+            "error_detail": self.errors,
+            "latency": stats(everything),
+            "by_kind": {kind: stats(values) for kind, values in sorted(self.samples.items())},
+            "clicks": {tab: stats(values) for tab, values in sorted(self.clicks.items())},
+        }
+
+
+class User:
+    # One browser: up to `connections` keep-alive connections, gzip accepted, bytes
+    # counted as received
+    def __init__(self, base, recorder, mix, think, rng, connections=BROWSER_CONNECTIONS):
+        parts = urlsplit(base)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.recorder = recorder
+        self.tabs, self.weights = list(mix), list(mix.values())
+        self.think = think
+        self.rng = rng
+        self.pool = ThreadPoolExecutor(max_workers=connections)
+        self._idle = []
+        self._idle_lock = threading.Lock()
+
+    def _connection(self):
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop()
+        return http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+    def _release(self, connection):
+        with self._idle_lock:
+            self._idle.append(connection)
+
+    def _request(self, kind, method, path, body=None):
+        headers = {"Accept-Encoding": "gzip"}
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        connection = self._connection()
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as error:
+            connection.close()
+            self.recorder.record(kind, time.perf_counter() - started, 0, type(error).__name__)
+            return None
+        self._release(connection)
+        seconds = time.perf_counter() - started
+        error = None if response.status in (200, 204) else f"HTTP {response.status}"
+        self.recorder.record(kind, seconds, len(payload), error)
+        if error or response.status == 204:
+            return None
+        if response.getheader("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        return payload
+
+    def _callback(self, kind, output, outputs, inputs, changed=()):
+        return self._request(kind, "POST", "/dash/_dash-update-component", {
+            "output": output, "outputs": outputs, "inputs": inputs, "changedPropIds": list(changed),
+        })
+
+    def open_page(self):
+        self._request("page /", "GET", "/")
+        self._request("page /dash/", "GET", "/dash/")
+        self._request("dash layout", "GET", "/dash/_dash-layout")
+        self._request("dash dependencies", "GET", "/dash/_dash-dependencies")
+
+    def click(self):
+        tab = self.rng.choices(self.tabs, self.weights)[0]
+        started = time.perf_counter()
+        payload = self._callback(f"tab {tab}", TAB_CALLBACK, {"id": "tabs-content", "property": "children"},
+                                 [{"id": "tabs", "property": "value", "value": tab}], ["tabs.value"])
+        if payload is None:
+            return
+        layout = json.loads(payload)["response"]["tabs-content"]["children"]
+        calls = []
+        for component in _components(layout):
+            props = component["props"]
+            graph_id = props.get("id")
+            callback = graph_callback(graph_id)
+            if callback is not None:
+                calls.append((f"graph {graph_id['tab']}/{graph_id['name']}", callback[0],
+                              {"id": graph_id, "property": "figure"}, callback[1]))
+            elif graph_id == "refugee-map-year":
+                calls.append(("graph refugees/map_year", REFUGEE_MAP_CALLBACK,
+                              {"id": "refugee-map-graph", "property": "figure"},
+                              [{"id": "refugee-map-year", "property": "value", "value": props.get("value")}]))
+        # The mounted graphs request their figures all at once
+        list(self.pool.map(lambda call: self._callback(*call), calls))
+        self.recorder.record_click(tab, time.perf_counter() - started)
+
+    def run(self, deadline, clicks):
+        try:
+            self.open_page()
+            done = 0
+            while time.monotonic() < deadline and (clicks is None or done < clicks):
+                self.click()
+                done += 1
+                if self.think:
+                    time.sleep(self.rng.expovariate(1 / self.think))
+        finally:
+            self.close()
+
+    def close(self):
+        self.pool.shutdown()
+        with self._idle_lock:
+            for connection in self._idle:
+                connection.close()
+            self._idle = []
+
+
+def process_tree(root):
+    # root and all its descendants, from /proc (Linux)
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as handle:
+                fields = handle.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def cpu_seconds(pids):
+    usage = {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as handle:
+                fields = handle.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        usage[pid] = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return usage
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(kind, port, workers, threads):
+    env = dict(os.environ, DASHBOARD_BIND=f"127.0.0.1:{port}")
+    if kind == "gunicorn":
+        env.update(DASHBOARD_WORKERS=str(workers), DASHBOARD_THREADS=str(threads))
+        command = [sys.executable, "serve.py"]
+    else:
+        command = [sys.executable, "-c",
+                   f"from app import server; server.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not answer /health within 120s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the dashboard with simulated tab clicks")
+    parser.add_argument("--url", help="server to test, otherwise one is started locally")
+    parser.add_argument("--pid", type=int, help="root pid of the --url server, for CPU accounting")
+    parser.add_argument("--server", choices=["gunicorn", "werkzeug"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of clicking per user")
+    parser.add_argument("--clicks", type=int, help="stop each user after this many clicks")
+    parser.add_argument("--connections", type=int, default=BROWSER_CONNECTIONS,
+                        help="parallel connections per user for a tab's graph callbacks")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between clicks in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="tab weights, e.g. overview=4,war=1")
+    parser.add_argument("--warmup", type=int, default=1, help="clicks per tab before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    process = None
+    if args.url:
+        base, root = args.url, args.pid
+    else:
+        port = free_port()
+        process = start_server(args.server, port, args.workers, args.threads)
+        base, root = f"http://127.0.0.1:{port}", process.pid
+
+    try:
+        # Warm-up clicks fill the datasets, aggregates and figure caches first
+        warmup = User(base, Recorder(), {tab: 1 for tab in mix}, 0, random.Random(args.seed), args.connections)
+        for _ in range(args.warmup * len(mix)):
+            warmup.click()
+        warmup.close()
+
+        pids = process_tree(root) if root else []
+        cpu_before = cpu_seconds(pids)
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+        users = [User(base, recorder, mix, args.think, random.Random(args.seed + index + 1), args.connections)
+                 for index in range(args.users)]
+        threads = [threading.Thread(target=user.run, args=(deadline, args.clicks)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        cpu_after = cpu_seconds(pids)
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+    report = recorder.summary(elapsed)
+    report["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    report["elapsed_seconds"] = elapsed
+    report["cpu"] = {
+        str(pid): {"role": "master" if pid == root else "child",
+                   "seconds": cpu_after[pid] - cpu_before.get(pid, 0.0),
+                   "utilisation": (cpu_after[pid] - cpu_before.get(pid, 0.0)) / elapsed}
+        for pid in cpu_after
+    }
+
+    latency = report["latency"]
+    print(f"{report['requests']} requests in {elapsed:.1f}s ({report['throughput_rps']:.1f} req/s), "
+          f"{report['errors']} errors, {report['bytes'] / 1e6:.1f} MB received")
+    if latency["count"]:
+        print(f"latency p50 {latency['p50'] * 1000:.1f} ms, p90 {latency['p90'] * 1000:.1f} ms, "
+              f"p99 {latency['p99'] * 1000:.1f} ms")
+    for kind, stats in report["by_kind"].items():
+        print(f"  {kind:<32} {stats['count']:>6}  p50 {stats['p50'] * 1000:8.1f} ms  p99 {stats['p99'] * 1000:8.1f} ms")
+    for tab, stats in report["clicks"].items():
+        print(f"  {'click ' + tab:<32} {stats['count']:>6}  p50 {stats['p50'] * 1000:8.1f} ms  p99 {stats['p99'] * 1000:8.1f} ms")
+    for pid, usage in sorted(report["cpu"].items()):
+        print(f"  pid {pid:<8} {usage['role']:<6} cpu {usage['seconds']:7.2f}s  ({usage['utilisation'] * 100:5.1f}%)")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks every stage of the dashboard on synthetic data at several scales:
+#
+#   python -m benchmarks.run                         # 1x 10x 100x 1000x
+#   python -m benchmarks.run --scales 1 10 --repeat 5 --output before.json
+#
+# Each scale runs in its own interpreter, pointed at its generated CSVs through
+# DASHBOARD_DATA_DIR, so module-level caches and settings start clean every time.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCALES = [1, 10, 100, 1000]
+TAB_CALLBACK = "tabs-content.children"
+GRAPH_CALLBACKS = {
+    "tab-graph": '{"name":["MATCH"],"tab":["MATCH"],"type":"tab-graph"}.figure',
+    "zoom-graph": '{"name":["MATCH"],"tab":["MATCH"],"type":"zoom-graph"}.figure',
+}
+REFUGEE_MAP_CALLBACK = "refugee-map-graph.figure"
+
+
+def timed(run, repeat):
+    # Runs run() repeat times, returns its last result and the timings in seconds
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - started)
+    return result, {"min": min(seconds), "median": statistics.median(seconds), "max": max(seconds), "runs": repeat}
+
+
+def _components(tree):
+    # Every component dict in a serialized Dash layout
+    if isinstance(tree, dict):
+        if "props" in tree:
+            yield tree
+        for value in tree.values():
+            yield from _components(value)
+    elif isinstance(tree, list):
+        for value in tree:
+            yield from _components(value)
+
+
+def _dispatch(client, output, outputs, inputs, changed=()):
+    response = client.post("/dash/_dash-update-component", json={
+        "output": output, "outputs": outputs, "inputs": inputs, "changedPropIds": list(changed),
+    })
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{output} returned {response.status_code}")
+    return response.get_data()
+
+
+def graph_callback(graph_id):
+    # Output and inputs of the callback that fills a mounted tab graph, or None
+    # for other components
+    if not isinstance(graph_id, dict) or graph_id.get("type") not in GRAPH_CALLBACKS:
+        return None
+    inputs = [{"id": graph_id, "property": "id", "value": graph_id}]
+    if graph_id["type"] == "zoom-graph":
+        inputs.append({"id": graph_id, "property": "relayoutData", "value": None})
+    return GRAPH_CALLBACKS[graph_id["type"]], inputs
+
+
+def render_tab(client, tab):
+    # One tab click as the browser does it: the tab callback, then every graph callback it
+    # mounts. Returns the bytes of the update_tab response and of everything together.
+    payload = _dispatch(client, TAB_CALLBACK, {"id": "tabs-content", "property": "children"},
+                        [{"id": "tabs", "property": "value", "value": tab}], ["tabs.value"])
+    total = len(payload)
+    layout = json.loads(payload)["response"]["tabs-content"]["children"]
+    for component in _components(layout):
+        props = component["props"]
+        graph_id = props.get("id")
+        callback = graph_callback(graph_id)
+        if callback is not None:
+            total += len(_dispatch(client, callback[0], {"id": graph_id, "property": "figure"}, callback[1]))
+        elif graph_id == "refugee-map-year":
+            total += len(_dispatch(client, REFUGEE_MAP_CALLBACK, {"id": "refugee-map-graph", "property": "figure"},
+                                   [{"id": "refugee-map-year", "property": "value", "value": props.get("value")}]))
+    return {"update_tab": len(payload), "total": total}
+
+
+def run_scale(repeat):
+    # Runs inside the per-scale interpreter and returns that scale's results
+    import app
+    from aggregates import AGGREGATES, materialise
+    from data_loader import CACHE_DIR, SOURCES, load_dataset, load_refugee_aggregates, memory_bytes
+    from datasets import registry
+    from figure_cache import figure_cache
+    from figure_slim import figure_to_json
+
+    results = {"load": {}, "cached_load": {}, "rows": {}, "memory_bytes": {}, "aggregates": {},
+               "figures": {}, "update_tab": {}}
+
+    def cold(load):
+        def run():
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+            return load()
+        return run
+
+    for name in SOURCES:
+        frame, results["load"][name] = timed(cold(lambda name=name: load_dataset(name)), repeat)
+        _, results["cached_load"][name] = timed(lambda name=name: load_dataset(name), repeat)
+        results["rows"][name] = len(frame)
+        results["memory_bytes"][name] = memory_bytes(frame)
+    # Refugee aggregates in both ingest modes: folded from the loaded table ("full",
+    # no cache involved), and streamed from the CSV in chunks ("stream", cached)
+    refugees = load_dataset("refugees")
+    _, results["load"]["refugee_aggregates"] = timed(lambda: load_refugee_aggregates(refugees), repeat)
+    _, results["load"]["refugee_aggregates_stream"] = timed(cold(load_refugee_aggregates), repeat)
+    _, results["cached_load"]["refugee_aggregates_stream"] = timed(load_refugee_aggregates, repeat)
+
+    # Aggregates are timed on their own: anything they read through get_aggregate
+    # is already cached by the time its turn comes
+    snapshot = registry.snapshot()
+    registry.warm()
+    for name, build in AGGREGATES.items():
+        _, results["aggregates"][name] = timed(lambda build=build: build(snapshot), repeat)
+    materialise(snapshot)
+
+    for (tab, name), build in app.FIGURES.items():
+        figure, build_time = timed(lambda build=build: build(snapshot), repeat)
+        payload, serialize_time = timed(lambda figure=figure: figure_to_json(figure, (tab, name)), repeat)
+        results["figures"][f"{tab}/{name}"] = {"build": build_time, "serialize": serialize_time, "bytes": len(payload)}
+
+    client = app.server.test_client()
+    for tab in app.TABS:
+        def click(tab=tab):
+            figure_cache.clear()
+            return render_tab(client, tab)
+        payload_bytes, cold_time = timed(click, repeat)
+        _, warm_time = timed(lambda tab=tab: render_tab(client, tab), repeat)
+        results["update_tab"][tab] = {"cold": cold_time, "warm": warm_time, "bytes": payload_bytes}
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    import numpy
+    import pandas
+    import plotly
+
+    return {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results",
+                                                         time.strftime("bench-%Y%m%d-%H%M%S.json")))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", help="generate into this directory and keep the CSVs")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        logging.basicConfig(level=logging.WARNING)
+        # Synthetic country names are unmatched on purpose
+        logging.getLogger("countries").setLevel(logging.ERROR)
+        json.dump(run_scale(args.repeat), sys.stdout)
+        return
+
+    from benchmarks.synthetic import generate
+
+    report = {"meta": metadata(), "repeat": args.repeat, "seed": args.seed, "scales": {}}
+    for scale in args.scales:
+        directory = os.path.join(args.keep_data, f"x{scale}") if args.keep_data else tempfile.mkdtemp(prefix=f"bench-x{scale}-")
+        try:
+            started = time.perf_counter()
+            generated = generate(directory, scale, args.seed)
+            print(f"x{scale}: generated {generated} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            env = dict(os.environ,
+                       DASHBOARD_DATA_DIR=directory,
+                       DASHBOARD_CACHE_DIR=os.path.join(directory, ".cache"),
+                       DASHBOARD_ARTIFACTS_DIR=os.path.join(directory, "artifacts"))
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--worker", str(scale), "--repeat", str(args.repeat)],
+                cwd=ROOT, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                sys.stderr.write(completed.stderr)
+                report["scales"][str(scale)] = {"error": completed.stderr.strip().splitlines()[-1:]}
+                continue
+            report["scales"][str(scale)] = dict(json.loads(completed.stdout), generated_rows=generated)
+            print(f"x{scale}: done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        finally:
+            if not args.keep_data:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.run import ROOT, render_tab
+
+# Where a fresh dashboard process spends its time before it can serve:
+#
+#   python -m benchmarks.startup                 # imports, data load and cleaning, aggregates, first requests
+#   python -m benchmarks.startup --cold --json   # ignore the on-disk dataset cache
+#
+# Time to first request runs from interpreter start to the first dashboard tab
+# answered with its data loaded, the same work serve.py does before forking.
+# It is checked against DASHBOARD_STARTUP_TARGET seconds.
+STARTUP_TARGET = float(os.environ.get("DASHBOARD_STARTUP_TARGET", "2.5"))
+# Imports the dashboard defers until a figure or report needs them
+DEFERRED_MODULES = ["scipy", "plotly.express"]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_breakdown(limit=12):
+    # Self time of every module `import app` pulls in, summed per top-level package
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                               cwd=ROOT, capture_output=True, text=True)
+    packages = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            package = match.group(4).split(".")[0]
+            packages[package] = packages.get(package, 0.0) + int(match.group(1)) / 1e6
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return dict(ranked[:limit])
+
+
+def interpreter_started():
+    # perf_counter() value at process start, from /proc where available
+    try:
+        with open("/proc/self/stat") as handle:
+            ticks = int(handle.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as handle:
+            uptime = float(handle.read().split()[0])
+        return time.perf_counter() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def profile():
+    started = interpreter_started()
+    phases = {}
+    if started is not None:
+        phases["interpreter"] = time.perf_counter() - started
+    else:
+        started = time.perf_counter()
+
+    mark = time.perf_counter()
+    import app
+    phases["import"] = time.perf_counter() - mark
+    deferred = {name: name in sys.modules for name in DEFERRED_MODULES}
+
+    from aggregates import materialise
+    from data_loader import load_stats
+    from datasets import SERVED, registry
+
+    mark = time.perf_counter()
+    registry.warm(SERVED)
+    phases["data"] = time.perf_counter() - mark
+    mark = time.perf_counter()
+    materialise(registry.snapshot())
+    phases["aggregates"] = time.perf_counter() - mark
+
+    # Layout construction as served: Dash serializes the layout and the callback
+    # graph on their first request, then the default tab is rendered
+    client = app.server.test_client()
+    requests = {}
+    for path in ["/", "/dash/", "/dash/_dash-layout", "/dash/_dash-dependencies"]:
+        mark = time.perf_counter()
+        status = client.get(path).status_code
+        requests[path] = {"seconds": time.perf_counter() - mark, "status": status}
+    phases["layout"] = sum(request["seconds"] for request in requests.values())
+    mark = time.perf_counter()
+    render_tab(client, "overview")
+    phases["first_tab"] = time.perf_counter() - mark
+    first_request = time.perf_counter() - started
+
+    datasets = {
+        name: {"source": stats["source"], "seconds": stats["seconds"], "stages": stats.get("stages", {})}
+        for name, stats in load_stats.items()
+    }
+    return {
+        "time_to_first_request": first_request,
+        "target": STARTUP_TARGET,
+        "within_target": first_request <= STARTUP_TARGET,
+        "phases": phases,
+        "datasets": datasets,
+        "requests": requests,
+        "deferred_imported": deferred,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Break dashboard startup time down by phase")
+    parser.add_argument("--cold", action="store_true", help="parse the CSVs instead of reading the dataset cache")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--no-imports", action="store_true", help="skip the per-package import breakdown")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        json.dump(profile(), sys.stdout)
+        return
+
+    # Measured in a fresh interpreter, so nothing this process imported counts
+    env = dict(os.environ, DASHBOARD_CACHE="0") if args.cold else None
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--worker"],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        sys.exit(completed.returncode)
+    report = json.loads(completed.stdout)
+    if not args.no_imports:
+        report["imports"] = import_breakdown()
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"time to first request {report['time_to_first_request']:.3f}s "
+              f"(target {report['target']:.1f}s, {'ok' if report['within_target'] else 'OVER'})")
+        for phase, seconds in report["phases"].items():
+            print(f"  {phase:<12} {seconds:7.3f}s")
+        for name, stats in report["datasets"].items():
+            stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in stats["stages"].items())
+            print(f"  data {name:<20} {stats['seconds']:7.3f}s from {stats['source']}{'  (' + stages + ')' if stages else ''}")
+        for package, seconds in report.get("imports", {}).items():
+            print(f"  import {package:<18} {seconds:7.3f}s")
+        for name, imported in report["deferred_imported"].items():
+            print(f"  {name} imported at startup: {'yes' if imported else 'no'}")
+    sys.exit(0 if report["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from countries import COUNTRY_CODES_PATH
+
+# Synthetic versions of the three source CSVs, in the same raw formats the cleaners
+# expect. Scale 1 matches the shipped row counts; larger scales add countries
+# (slavery, migration) or origin/asylum pairs (refugees).
+SLAVERY_ROWS = 180
+MIGRATION_COUNTRIES = 5
+MIGRATION_YEARS = range(1960, 2024)
+REFUGEE_ROWS = 4800
+REFUGEE_YEARS = range(2000, 2024)
+
+REGIONS = ["Asia and the Pacific", "Europe and Central Asia", "Africa", "Americas", "Arab States"]
+SLAVERY_PREVALENCE = "Estimated prevalence of modern slavery per 1,000 population"
+SLAVERY_COUNT = "Estimated number of people in modern slavery"
+REFUGEE_COUNTS = [
+    "Refugees under UNHCR's mandate", "Asylum-seekers", "IDPs of concern to UNHCR",
+    "Venezuelans displaced abroad", "Stateless persons", "Others of concern",
+]
+
+
+def country_names(count):
+    # Real names (with their ISO3 codes) first so matching is exercised, then
+    # numbered synthetic names that deliberately have no code
+    codes = pd.read_csv(COUNTRY_CODES_PATH, keep_default_na=False).drop_duplicates("iso3")
+    names, iso3 = list(codes["name"])[:count], list(codes["iso3"])[:count]
+    synthetic = [f"Synthetic Country {index:05d}" for index in range(count - len(names))]
+    return names + synthetic, iso3 + [""] * len(synthetic)
+
+
+def _thousands(values):
+    return [f"{value:,.0f}" for value in values]
+
+
+def slavery(scale, rng):
+    rows = SLAVERY_ROWS * scale
+    names, _ = country_names(rows)
+    population = rng.lognormal(16, 1.8, rows).round(-3)
+    prevalence = rng.gamma(2.0, 3.5, rows).round(1)
+    frame = pd.DataFrame({
+        "  Country ": names,
+        "Population": ["  " + text + " " for text in _thousands(population)],
+        "Region": rng.choice(REGIONS, rows),
+        SLAVERY_PREVALENCE: prevalence,
+        SLAVERY_COUNT: _thousands((population * prevalence / 1000).round(-3)),
+    })
+    # The real file marks a few unknown populations with "-"
+    frame.loc[rng.random(rows) < 0.02, "Population"] = " - "
+    return frame
+
+
+def migration(scale, rng):
+    countries = MIGRATION_COUNTRIES * scale
+    names, _ = country_names(countries)
+    years = np.array(MIGRATION_YEARS)
+    start = rng.lognormal(16, 1.5, countries)
+    growth = rng.normal(0.02, 0.01, countries)
+    population = start[:, None] * (1 + growth[:, None]) ** (years - years[0])[None, :]
+    net = rng.normal(0, 0.004, population.shape) * population
+    frame = pd.DataFrame({
+        "Country": np.repeat(names, len(years)),
+        "Year": np.tile(years[::-1], countries),
+        "total_population": population[:, ::-1].ravel().round(),
+        "net_migration": net[:, ::-1].ravel().round(),
+    })
+    return frame
+
+
+def refugees(scale, rng):
+    rows = REFUGEE_ROWS * scale
+    # Origin/asylum countries stay within the real list, more rows means more pairs
+    names, codes = country_names(min(10 * scale, 200))
+    origin = rng.integers(0, len(names), rows)
+    asylum = rng.integers(0, len(names), rows)
+    frame = pd.DataFrame({
+        "Year": rng.choice(np.array(REFUGEE_YEARS), rows),
+        "Country of origin": np.array(names, dtype=object)[origin],
+        "Country of origin (ISO)": np.array(codes, dtype=object)[origin],
+        "Country of asylum": np.array(names, dtype=object)[asylum],
+        "Country of asylum (ISO)": np.array(codes, dtype=object)[asylum],
+    })
+    frame[REFUGEE_COUNTS[0]] = rng.integers(0, 50000, rows)
+    frame[REFUGEE_COUNTS[1]] = rng.integers(0, 5000, rows)
+    frame[REFUGEE_COUNTS[2]] = 0
+    frame[REFUGEE_COUNTS[3]] = 0
+    frame[REFUGEE_COUNTS[4]] = rng.integers(0, 100, rows)
+    frame[REFUGEE_COUNTS[5]] = rng.integers(0, 100, rows)
+    return frame.sort_values("Year", kind="stable")
+
+
+def generate(directory, scale, seed=0):
+    # Write the three CSVs for `scale` into directory, returns their row counts
+    from data_loader import SOURCES
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    rows = {}
+    for name, build in (("slavery", slavery), ("migration", migration), ("refugees", refugees)):
+        frame = build(scale, rng)
+        frame.to_csv(os.path.join(directory, SOURCES[name]), index=False)
+        rows[name] = len(frame)
+    return rows
@@ -0,0 +1,97 @@
+import gzip
+import os
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Responses smaller than this aren't worth the CPU
+COMPRESS_MIN_BYTES = int(os.environ.get("DASHBOARD_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("DASHBOARD_GZIP_LEVEL", "6"))
+BROTLI_LEVEL = int(os.environ.get("DASHBOARD_BROTLI_LEVEL", "5"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/javascript",
+    "text/plain",
+}
+
+compression_stats = {
+    "responses": 0,
+    "gzip": 0,
+    "br": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def choose_encoding(accept_encoding):
+    # Pick br or gzip from the Accept-Encoding header: the higher q wins, br on a
+    # tie, and q=0 (or "*;q=0" for an unlisted one) rules an encoding out
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            offered[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        quality = offered.get(encoding, offered.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(payload, encoding):
+    if encoding == "br":
+        return brotli.compress(payload, quality=BROTLI_LEVEL)
+    return gzip.compress(payload, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    # Flask after_request hook, covers Dash callbacks, layout and page routes alike
+    if (
+        response.direct_passthrough
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+    payload = response.get_data()
+    if len(payload) < COMPRESS_MIN_BYTES:
+        return response
+
+    compressed = compress(payload, encoding)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    with _stats_lock:
+        compression_stats["responses"] += 1
+        compression_stats[encoding] += 1
+        compression_stats["bytes_in"] += len(payload)
+        compression_stats["bytes_out"] += len(compressed)
+    return response
+
+
+def init_compression(server):
+    server.after_request(compress_response)
@@ -0,0 +1,77 @@
+import logging
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Reference table of country names and common aliases (World Bank, UNHCR, GSI
+# spellings) to ISO 3166-1 alpha-3 codes. Shipped with the code, not the data.
+COUNTRY_CODES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "country_codes.csv")
+
+
+def normalise(name):
+    # Case, accents and stray whitespace don't matter when matching names
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+
+# Every ISO3 code gets a small integer key, and lookups go through numpy arrays
+# indexed by that key, so joining datasets by country is an array take.
+class CountryIndex:
+    def __init__(self, table):
+        self.codes = np.array(sorted(table["iso3"].unique()), dtype=object)
+        self._key_of_code = {code: key for key, code in enumerate(self.codes)}
+        self._keys = {normalise(code): key for code, key in self._key_of_code.items()}
+        for name, code in zip(table["name"], table["iso3"]):
+            self._keys[normalise(name)] = self._key_of_code[code]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def keys(self, names):
+        # Integer key per name, -1 where unknown. Only distinct names hit the dict.
+        values = pd.Series(names).astype("category")
+        lookup = np.array([self._keys.get(normalise(name), -1) for name in values.cat.categories], dtype=np.int32)
+        codes = values.cat.codes.to_numpy()
+        if not len(lookup):
+            return np.full(len(codes), -1, dtype=np.int32)
+        return np.where(codes >= 0, lookup[np.maximum(codes, 0)], -1).astype(np.int32)
+
+    def iso3(self, names):
+        keys = self.keys(names)
+        return np.where(keys >= 0, self.codes[np.maximum(keys, 0)], None)
+
+    def unmatched(self, names):
+        values = pd.Series(names).dropna().unique()
+        return sorted(str(name) for name in values if normalise(name) not in self._keys)
+
+    def positions(self, keys):
+        # Dense array from country key to row position (-1 when absent), for O(1) row lookups
+        positions = np.full(len(self.codes), -1, dtype=np.int64)
+        valid = keys >= 0
+        positions[keys[valid]] = np.flatnonzero(valid)
+        return positions
+
+    def key(self, iso3):
+        return self._key_of_code.get(iso3, -1)
+
+
+@lru_cache(maxsize=1)
+def country_index():
+    return CountryIndex(pd.read_csv(COUNTRY_CODES_PATH, keep_default_na=False))
+
+
+def add_iso3(frame, column, target="ISO3", dataset=None):
+    # Resolve a name column to ISO3 once at load and report what didn't match
+    index = country_index()
+    frame[target] = index.iso3(frame[column])
+    unmatched = index.unmatched(frame[column])
+    if unmatched:
+        logger.warning("%d %s names have no ISO3 code: %s", len(unmatched), dataset or column, ", ".join(unmatched))
+    return frame
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from countries import add_iso3
+
+logger = logging.getLogger(__name__)
+
+# Where the source CSVs live and where the cleaned copies are cached
+DATA_DIR = os.environ.get("DASHBOARD_DATA_DIR", "./data")
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(DATA_DIR, ".cache"))
+CACHE_ENABLED = os.environ.get("DASHBOARD_CACHE", "1") != "0"
+
+# Bump when the cleaning steps change so stale caches are rebuilt
+CACHE_FORMAT = 4
+
+SOURCES = {
+    "slavery": "Global_Slavery_Index_2023.csv",
+    "migration": "pop_and_net_migration.csv",
+    "refugees": "United_Nations_Refugee_Data.csv",
+}
+
+# How each dataset was loaded on this process start (csv or cache, timings)
+load_stats = {}
+
+
+def source_path(name):
+    return os.path.join(DATA_DIR, SOURCES[name])
+
+
+# Clean slavery data
+def clean_slavery_data(slavery_data):
+    slavery_data.columns = slavery_data.columns.str.strip()
+    slavery_data["Country"] = slavery_data["Country"].str.strip()
+    add_iso3(slavery_data, "Country", dataset="slavery")
+    # Population uses "-" for unknown values, so coerce those to NaN
+    slavery_data["Population"] = pd.to_numeric(
+        slavery_data["Population"].str.replace(",", ""), errors="coerce"
+    )
+    slavery_data["Estimated number of people in modern slavery"] = (
+        slavery_data["Estimated number of people in modern slavery"].str.replace(",", "").astype(float)
+    )
+
+    # Fill missing values
+    for column in [
+        "Population",
+        "Estimated prevalence of modern slavery per 1,000 population",
+        "Estimated number of people in modern slavery",
+    ]:
+        slavery_data[column] = slavery_data[column].fillna(slavery_data[column].median())
+    return slavery_data
+
+
+def zscore(series):
+    # Same as scipy.stats.zscore (population std, NaN anywhere gives all NaN),
+    # without importing SciPy at startup for one formula
+    return (series - series.mean(skipna=False)) / series.std(ddof=0, skipna=False)
+
+
+# Prepare migration data
+def clean_migration_data(migration_data):
+    migration_data['population_growth_rate'] = migration_data.groupby('Country')['total_population'].pct_change() * 100
+    migration_data['migration_rate'] = migration_data.groupby('Country')['net_migration'].pct_change() * 100
+    migration_data['population_migration_ratio'] = migration_data['net_migration'] / migration_data['total_population']
+    migration_data['z_total_population'] = zscore(migration_data['total_population'])
+    migration_data['z_net_migration'] = zscore(migration_data['net_migration'])
+    add_iso3(migration_data, "Country", dataset="migration")
+    return migration_data
+
+
+def clean_refugee_data(refugee_data):
+    return refugee_data
+
+
+# Compact in-memory dtypes. Repeated country/region names become categoricals,
+# Year becomes a small int, and the remaining numeric columns are downcast
+# whenever the smaller type holds every value exactly.
+SCHEMAS = {
+    "slavery": {
+        "categories": ["Country", "ISO3", "Region"],
+        "small_ints": [],
+    },
+    "migration": {
+        "categories": ["Country", "ISO3"],
+        "small_ints": ["Year"],
+    },
+    "refugees": {
+        "categories": [
+            "Country of origin",
+            "Country of origin (ISO)",
+            "Country of asylum",
+            "Country of asylum (ISO)",
+        ],
+        "small_ints": ["Year"],
+    },
+}
+
+
+def downcast_numeric(series):
+    values = series.to_numpy()
+    if series.dtype.kind == "f" and not series.isna().any() and np.array_equal(values, np.round(values)):
+        return pd.to_numeric(series.astype("int64"), downcast="integer")
+    if series.dtype.kind in "iu":
+        return pd.to_numeric(series, downcast="integer")
+    if series.dtype == np.float64:
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return series.astype(np.float32)
+    return series
+
+
+def apply_schema(frame, schema):
+    for column in schema["categories"]:
+        if column in frame.columns:
+            frame[column] = frame[column].astype("category")
+    for column in schema["small_ints"]:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], downcast="integer")
+    skip = set(schema["categories"]) | set(schema["small_ints"])
+    for column in frame.columns:
+        if column not in skip and frame[column].dtype.kind in "iuf":
+            frame[column] = downcast_numeric(frame[column])
+    return frame
+
+
+def memory_bytes(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+CLEANERS = {
+    "slavery": clean_slavery_data,
+    "migration": clean_migration_data,
+    "refugees": clean_refugee_data,
+}
+
+
+# Content hashes by (path, size, mtime) so a file is hashed once per change
+_hashes = {}
+
+
+def file_sha256(path, stat=None):
+    stat = stat or os.stat(path)
+    stamp = (path, stat.st_size, stat.st_mtime_ns)
+    if stamp not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        _hashes[stamp] = digest.hexdigest()
+    return _hashes[stamp]
+
+
+def source_key(path):
+    # Size and mtime catch most edits, the content hash catches the rest
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(path, stat),
+        "format": CACHE_FORMAT,
+    }
+
+
+def _cache_paths(name, part):
+    base = os.path.join(CACHE_DIR, name)
+    return f"{base}.{part}.feather", base + ".json"
+
+
+def _read_cache(name, key):
+    _, meta_path = _cache_paths(name, None)
+    try:
+        with open(meta_path) as handle:
+            meta = json.load(handle)
+        if meta.get("key") != key:
+            return None, None
+        parts = {part: pd.read_feather(_cache_paths(name, part)[0]) for part in meta["parts"]}
+        return parts, meta
+    except (OSError, ValueError, KeyError) as exc:
+        if not isinstance(exc, FileNotFoundError):
+            logger.warning("Ignoring unreadable cache for %s: %s", name, exc)
+        return None, None
+
+
+def _write_cache(name, key, parts, build_seconds, memory_before):
+    _, meta_path = _cache_paths(name, None)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to temp files first so a concurrent reader never sees half a cache
+        for part, frame in parts.items():
+            frame_path = _cache_paths(name, part)[0]
+            frame.to_feather(frame_path + ".tmp")
+            os.replace(frame_path + ".tmp", frame_path)
+        with open(meta_path + ".tmp", "w") as handle:
+            json.dump({
+                "key": key,
+                "parts": list(parts),
+                "build_seconds": build_seconds,
+                "memory_before": memory_before,
+            }, handle)
+        os.replace(meta_path + ".tmp", meta_path)
+    except (OSError, ImportError, ValueError) as exc:
+        logger.warning("Could not write cache for %s: %s", name, exc)
+
+
+def _load_cached(name, path, build):
+    # build() returns ({part: frame}, memory before the schema was applied)
+    started = time.perf_counter()
+    key = source_key(path) if CACHE_ENABLED else None
+
+    if key is not None:
+        parts, meta = _read_cache(name, key)
+        if parts is not None:
+            elapsed = time.perf_counter() - started
+            saved = max(meta["build_seconds"] - elapsed, 0.0)
+            load_stats[name] = {
+                "source": "cache",
+                "seconds": elapsed,
+                "saved_seconds": saved,
+                "memory_before": meta["memory_before"],
+                "memory_after": sum(memory_bytes(frame) for frame in parts.values()),
+            }
+            logger.info(
+                "Loaded %s from cache in %.3fs (saved %.3fs), memory %.1f MB -> %.1f MB",
+                name, elapsed, saved, meta["memory_before"] / 1e6, load_stats[name]["memory_after"] / 1e6,
+            )
+            return parts
+
+    parts, memory_before = build()
+    memory_after = sum(memory_bytes(frame) for frame in parts.values())
+    build_seconds = time.perf_counter() - started
+    if key is not None:
+        _write_cache(name, key, parts, build_seconds, memory_before)
+    load_stats[name] = {
+        "source": "csv",
+        "seconds": build_seconds,
+        "saved_seconds": 0.0,
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+    }
+    logger.info(
+        "Loaded %s from %s in %.3fs, memory %.1f MB -> %.1f MB",
+        name, path, build_seconds, memory_before / 1e6, memory_after / 1e6,
+    )
+    return parts
+
+
+def load_dataset(name):
+    # Seconds spent reading, cleaning and compacting, when built from the CSV
+    stages = {}
+
+    def build():
+        started = time.perf_counter()
+        frame = pd.read_csv(source_path(name))
+        stages["read"] = time.perf_counter() - started
+        frame = CLEANERS[name](frame)
+        stages["clean"] = time.perf_counter() - started - stages["read"]
+        memory_before = memory_bytes(frame)
+        frame = apply_schema(frame, SCHEMAS[name])
+        stages["schema"] = time.perf_counter() - started - stages["read"] - stages["clean"]
+        return {"frame": frame}, memory_before
+
+    frame = _load_cached(name, source_path(name), build)["frame"]
+    load_stats[name]["stages"] = stages
+    return frame
+
+
+# Every refugee chart only needs these sums, so they can be folded chunk by chunk
+# instead of holding the whole UNHCR table in memory.
+REFUGEE_COUNT = "Refugees under UNHCR's mandate"
+REFUGEE_AGGREGATES = {
+    "by_year": (["Year"], [REFUGEE_COUNT, "Stateless persons", "Others of concern"]),
+    "by_asylum": (["Country of asylum"], [REFUGEE_COUNT]),
+    "by_asylum_year": (["Country of asylum", "Year"], [REFUGEE_COUNT]),
+    "by_asylum_iso_year": (["Country of asylum (ISO)", "Year"], [REFUGEE_COUNT]),
+    "by_origin_iso_year": (["Country of origin (ISO)", "Year"], [REFUGEE_COUNT]),
+}
+
+# "full" keeps the refugee table in memory, "stream" only keeps the aggregates
+REFUGEE_INGEST = os.environ.get("DASHBOARD_REFUGEE_INGEST", "full")
+REFUGEE_CHUNKSIZE = int(os.environ.get("DASHBOARD_REFUGEE_CHUNKSIZE", "250000"))
+
+
+def _available_aggregates(columns):
+    # Older extracts lack the ISO columns, so skip groupings they can't fill
+    available = {}
+    for name, (keys, values) in REFUGEE_AGGREGATES.items():
+        values = [value for value in values if value in columns]
+        if values and all(key in columns for key in keys):
+            available[name] = (keys, values)
+    return available
+
+
+def _finish_aggregate(frame):
+    return apply_schema(frame.reset_index(), SCHEMAS["refugees"])
+
+
+def aggregate_refugee_data(refugee_data):
+    aggregates = {}
+    for name, (keys, values) in _available_aggregates(refugee_data.columns).items():
+        aggregates[name] = _finish_aggregate(refugee_data.groupby(keys, observed=True)[values].sum())
+    return aggregates
+
+
+def stream_refugee_aggregates(path, chunksize=REFUGEE_CHUNKSIZE):
+    groupings = _available_aggregates(pd.read_csv(path, nrows=0).columns)
+    usecols = {column for keys, values in groupings.values() for column in keys + values}
+    totals = dict.fromkeys(groupings)
+    for chunk in pd.read_csv(path, usecols=list(usecols), chunksize=chunksize):
+        for name, (keys, values) in groupings.items():
+            part = chunk.groupby(keys)[values].sum()
+            if totals[name] is not None:
+                # Fold the running totals and this chunk, memory stays bounded by the group count
+                part = pd.concat([totals[name], part]).groupby(level=list(range(len(keys)))).sum()
+            totals[name] = part
+    return {name: _finish_aggregate(frame) for name, frame in totals.items() if frame is not None}
+
+
+def load_refugee_aggregates(refugee_data=None):
+    # In full mode the aggregates come from the already loaded table
+    if refugee_data is not None:
+        return aggregate_refugee_data(refugee_data)
+
+    path = source_path("refugees")
+
+    def build():
+        parts = stream_refugee_aggregates(path)
+        return parts, sum(memory_bytes(frame) for frame in parts.values())
+
+    return _load_cached("refugee_aggregates", path, build)
@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import time
+
+from data_loader import REFUGEE_INGEST, SOURCES, load_dataset, load_refugee_aggregates, source_path
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+load_seconds = histogram("dashboard_dataset_load_seconds", "Time to load and clean a dataset.", ["dataset"])
+
+# Seconds between checks of ./data when the watcher is running
+WATCH_INTERVAL = float(os.environ.get("DASHBOARD_WATCH_INTERVAL", "2"))
+
+
+def file_stamp(source):
+    try:
+        stat = os.stat(source_path(source))
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+# One consistent version of the datasets. Frames are still loaded lazily, but once
+# loaded they never change, so a callback holding a snapshot sees the same data
+# from start to finish even if a reload happens meanwhile.
+class DataSnapshot:
+    def __init__(self, version, loaders, stamps, frames=None):
+        self.version = version
+        self.stamps = dict(stamps)
+        self._loaders = loaders
+        self._frames = dict(frames or {})
+        self._derived = {}
+        self._locks = {name: threading.Lock() for name in loaders}
+        self._derived_lock = threading.RLock()
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._frames
+
+    def loaded_frames(self):
+        return dict(self._frames)
+
+    def get(self, name):
+        frame = self._frames.get(name)
+        if frame is not None:
+            return frame
+        if name not in self._loaders:
+            raise KeyError(f"Unknown dataset: {name}")
+        # One lock per dataset so a slow refugee load doesn't block the others
+        with self._locks[name]:
+            frame = self._frames.get(name)
+            if frame is None:
+                with load_seconds.time(dataset=name):
+                    frame = self._loaders[name](self)
+                self._frames[name] = frame
+        return frame
+
+    def derived(self, key, build):
+        # Values computed from this snapshot's data, dropped with the snapshot
+        if key in self._derived:
+            return self._derived[key]
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+        return self._derived[key]
+
+
+# Named datasets that are only loaded the first time something asks for them
+class DatasetRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload_count = 0
+        self.last_reload_seconds = None
+        self._snapshot = DataSnapshot(0, {}, {})
+
+    def register(self, name, loader, source=None):
+        # loader(snapshot) builds the dataset, source names the CSV it comes from
+        with self._lock:
+            self._loaders[name] = loader
+            self._sources[name] = source or name
+            self._snapshot = DataSnapshot(self._snapshot.version + 1, dict(self._loaders), self._stamps())
+
+    def _stamps(self):
+        return {name: file_stamp(source) for name, source in self._sources.items()}
+
+    def names(self):
+        return list(self._loaders)
+
+    def source(self, name):
+        return self._sources[name]
+
+    def snapshot(self):
+        return self._snapshot
+
+    def is_loaded(self, name):
+        return self._snapshot.is_loaded(name)
+
+    def get(self, name):
+        return self._snapshot.get(name)
+
+    def warm(self, names=None):
+        # Load datasets up front, e.g. before forking workers
+        snapshot = self._snapshot
+        for name in names or snapshot.names():
+            snapshot.get(name)
+
+    def on_reload(self, listener):
+        # listener(snapshot) runs after every swap to a new snapshot
+        self._listeners.append(listener)
+
+    def changed(self):
+        current = self._snapshot
+        stamps = self._stamps()
+        return [name for name in current.names() if stamps[name] != current.stamps.get(name)]
+
+    def reload(self, names=None):
+        # Builds the new snapshot completely before swapping it in. A missing source
+        # or a failing loader raises and leaves the current snapshot serving.
+        started = time.perf_counter()
+        current = self._snapshot
+        names = set(current.names() if names is None else names)
+        stamps = self._stamps()
+        missing = sorted(name for name in names if stamps[name] is None)
+        if missing:
+            raise FileNotFoundError(f"Source missing for {', '.join(missing)}")
+
+        # Keep unchanged frames, rebuild the changed ones that were in use
+        frames = {n: f for n, f in current.loaded_frames().items() if n not in names}
+        new = DataSnapshot(current.version + 1, current._loaders, stamps, frames)
+        for name in names:
+            if current.is_loaded(name):
+                new.get(name)
+
+        with self._lock:
+            self._snapshot = new
+            self.reload_count += 1
+            self.last_reload_seconds = time.perf_counter() - started
+        logger.info(
+            "Reloaded %s as snapshot %d in %.3fs",
+            ", ".join(sorted(names)), new.version, self.last_reload_seconds,
+        )
+        for listener in self._listeners:
+            listener(new)
+        return new
+
+    def watch(self, interval=WATCH_INTERVAL):
+        # Poll the source files in a background thread and reload on change
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch_loop(self, interval):
+        # Source stamps of the last failed reload, retried once the files change again
+        failed = None
+        while not self._stop.wait(interval):
+            changed = self.changed()
+            if not changed:
+                failed = None
+                continue
+            stamps = self._stamps()
+            if stamps == failed:
+                continue
+            try:
+                self.reload(changed)
+                failed = None
+            except Exception:
+                failed = stamps
+                logger.exception("Reload of %s failed, keeping snapshot %d",
+                                 ", ".join(changed), self._snapshot.version)
+
+
+def _refugee_aggregates(snapshot):
+    if REFUGEE_INGEST == "stream":
+        return load_refugee_aggregates()
+    return load_refugee_aggregates(snapshot.get("refugees"))
+
+
+registry = DatasetRegistry()
+for _name in SOURCES:
+    registry.register(_name, lambda snapshot, name=_name: load_dataset(name))
+registry.register("refugee_aggregates", _refugee_aggregates, source="refugees")
+
+# Datasets the dashboard reads. In stream mode the raw refugee table is never
+# kept, only the aggregates folded from it, so warming must not load it.
+SERVED = [name for name in SOURCES if not (REFUGEE_INGEST == "stream" and name == "refugees")]
+SERVED.append("refugee_aggregates")
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+# Points kept per line: about one per horizontal pixel of a chart CHART_WIDTH pixels
+# wide. This is a fixed setting, not the width a graph actually renders at:
+# figures are cached and precomputed once per snapshot for every client, and the
+# server never sees the browser's layout.
+CHART_WIDTH = int(os.environ.get("DASHBOARD_CHART_WIDTH", "1200"))
+POINT_BUDGET = int(os.environ.get("DASHBOARD_POINT_BUDGET", str(CHART_WIDTH)))
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: indices of the points to keep, first and last included.
+    # x must be sorted. Bucket means come from cumulative sums and each bucket's
+    # triangle areas are one numpy expression; only the walk over buckets is a loop.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sum_x = np.concatenate([[0.0], np.cumsum(x)])
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])
+    mean_x = (sum_x[ends] - sum_x[starts]) / (ends - starts)
+    mean_y = (sum_y[ends] - sum_y[starts]) / (ends - starts)
+    # The third corner of each triangle is the next bucket's mean, or the last point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - next_x[bucket]) * (by - y[a]) - (x[a] - bx) * (next_y[bucket] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def downsample_frame(frame, x, columns, budget=POINT_BUDGET, x_range=None, by=None):
+    # Rows of frame within x_range, thinned to `budget` points per line with LTTB.
+    # A row is kept if any of the plotted columns needs it, and rows keep their order.
+    if x_range is not None:
+        frame = frame[frame[x].between(*x_range)]
+    if by is None:
+        groups = [np.arange(len(frame))]
+    else:
+        groups = frame.groupby(by, observed=True).indices.values()
+
+    xs = frame[x].to_numpy(dtype=np.float64)
+    keep = np.zeros(len(frame), dtype=bool)
+    for positions in groups:
+        if len(positions) <= budget:
+            keep[positions] = True
+            continue
+        positions = positions[np.argsort(xs[positions], kind="stable")]
+        for column in columns:
+            ys = frame[column].to_numpy(dtype=np.float64)[positions]
+            valid = np.flatnonzero(np.isfinite(ys))
+            keep[positions[valid[lttb(xs[positions][valid], ys[valid], budget)]]] = True
+    return frame[keep]
+
+
+def zoom_range(relayout):
+    # The x range a Graph's relayoutData zoomed to, or None (autorange, autosize, y-only zoom...)
+    if not relayout:
+        return None
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        bounds = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif isinstance(relayout.get("xaxis.range"), list):
+        bounds = relayout["xaxis.range"]
+    else:
+        return None
+    try:
+        low, high = sorted(float(bound) for bound in bounds)
+    except (TypeError, ValueError):
+        return None
+    return low, high
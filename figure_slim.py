@@ -0,0 +1,196 @@
+import base64
+import importlib.util
+import json
+import logging
+import os
+import random
+import re
+import threading
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+SLIM_FIGURES = os.environ.get("DASHBOARD_SLIM_FIGURES", "1") != "0"
+# Significant digits kept in numeric arrays, more than any axis or hover label shows
+DISPLAY_DIGITS = int(os.environ.get("DASHBOARD_DISPLAY_DIGITS", "6"))
+# plotly.js decodes base64 typed arrays from 2.28 on
+TYPED_ARRAYS_PLOTLYJS = (2, 28)
+TYPED_ARRAY_MIN_LENGTH = 8
+PLOTLYJS_HEADER = re.compile(rb"plotly\.js v(\d+)\.(\d+)")
+
+
+def served_plotlyjs_version():
+    # (major, minor) of the plotly.js the Dash front end runs, or None. dash 2.17+
+    # serves the copy in the plotly package, older releases bundle their own in dcc.
+    for package, parts in [("dash", ("dcc", "plotly.min.js")), ("plotly", ("package_data", "plotly.min.js"))]:
+        spec = importlib.util.find_spec(package)
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        try:
+            with open(os.path.join(spec.submodule_search_locations[0], *parts), "rb") as handle:
+                match = PLOTLYJS_HEADER.search(handle.read(512))
+        except OSError:
+            continue
+        if match:
+            return int(match.group(1)), int(match.group(2))
+    return None
+
+
+TYPED_ARRAYS = os.environ.get("DASHBOARD_TYPED_ARRAYS", "1") != "0"
+if TYPED_ARRAYS and (served_plotlyjs_version() or (0, 0)) < TYPED_ARRAYS_PLOTLYJS:
+    # Older plotly.js would draw the encoded arrays as empty or garbage traces
+    logger.warning("plotly.js %s served by dash can't decode typed arrays, sending plain lists",
+                   ".".join(map(str, served_plotlyjs_version() or ("unknown",))))
+    TYPED_ARRAYS = False
+
+# Trace attributes that are safe to hoist into the template when every trace of a
+# type shares the same value
+TEMPLATE_ATTRIBUTES = {
+    "alignmentgroup", "boxpoints", "fill", "hoverinfo", "hovertemplate", "mode",
+    "notched", "offsetgroup", "opacity", "orientation", "showlegend", "textposition",
+}
+
+# Subplot references that plotly.js fills in anyway
+DEFAULT_REFERENCES = {"xaxis": "x", "yaxis": "y", "geo": "geo"}
+
+TYPED_DTYPES = [
+    ("i1", np.int8), ("u1", np.uint8), ("i2", np.int16),
+    ("u2", np.uint16), ("i4", np.int32), ("u4", np.uint32),
+]
+
+# Serialized size per figure key, before and after slimming. Measuring the
+# "before" side serializes the figure a second time, so it is only done for
+# this fraction of builds, or for all of them when debug logging is on.
+SLIM_SAMPLE_RATE = float(os.environ.get("DASHBOARD_SLIM_SAMPLE_RATE", "0"))
+slim_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _numeric_array(value):
+    if isinstance(value, (list, tuple)) and len(value) >= 2:
+        if all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value):
+            value = np.asarray(value)
+    if isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype.kind in "iuf":
+        return value
+    return None
+
+
+def round_significant(values, digits=DISPLAY_DIGITS):
+    values = values.astype(np.float64)
+    finite = np.isfinite(values) & (values != 0)
+    magnitude = np.zeros_like(values)
+    magnitude[finite] = np.floor(np.log10(np.abs(values[finite])))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.where(finite, np.round(values * scale) / scale, values)
+
+
+def encode_array(values):
+    # Smallest exact integer typed array, float64 otherwise
+    if values.dtype.kind == "f" and np.all(np.isfinite(values)) and np.array_equal(values, np.round(values)):
+        values = values.astype(np.int64)
+    if values.dtype.kind in "iu":
+        for code, dtype in TYPED_DTYPES:
+            info = np.iinfo(dtype)
+            if values.min() >= info.min and values.max() <= info.max:
+                return {"dtype": code, "bdata": base64.b64encode(values.astype(dtype).tobytes()).decode()}
+        values = values.astype(np.float64)
+    # No float32: 104.6 would come back as 104.5999984741211 in unformatted hover labels
+    return {"dtype": "f8", "bdata": base64.b64encode(values.astype(np.float64).tobytes()).decode()}
+
+
+def _slim_value(value):
+    array = _numeric_array(value)
+    if array is not None:
+        if array.dtype.kind == "f":
+            array = round_significant(array)
+        values = array.tolist()
+        if TYPED_ARRAYS and len(array) >= TYPED_ARRAY_MIN_LENGTH:
+            # Short decimals can beat base64 of a float64, keep whichever is smaller
+            encoded = encode_array(array)
+            if len(encoded["bdata"]) < len(json.dumps(values, separators=(",", ":"))):
+                return encoded
+        return values
+    if isinstance(value, dict):
+        slim = {key: _slim_value(item) for key, item in value.items()}
+        return {key: item for key, item in slim.items() if item is not None and item != {}}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def _hoist_shared(data, template):
+    # Move attributes every trace of a type agrees on into the template defaults
+    by_type = {}
+    for trace in data:
+        by_type.setdefault(trace.get("type", "scatter"), []).append(trace)
+    template_data = template.setdefault("data", {})
+    for trace_type, traces in by_type.items():
+        if len(traces) < 2:
+            continue
+        shared = {}
+        for attribute in TEMPLATE_ATTRIBUTES:
+            values = [trace.get(attribute) for trace in traces]
+            if values[0] is not None and all(value == values[0] for value in values):
+                shared[attribute] = values[0]
+        if not shared:
+            continue
+        defaults = template_data.setdefault(trace_type, [{}])
+        for entry in defaults:
+            entry.update(shared)
+        for trace in traces:
+            for attribute in shared:
+                del trace[attribute]
+
+
+def _slim_trace(trace):
+    trace = _slim_value(trace)
+    trace.pop("uid", None)
+    for reference, default in DEFAULT_REFERENCES.items():
+        if trace.get(reference) == default:
+            del trace[reference]
+    return trace
+
+
+def slim_figure(figure):
+    # figure is a plotly figure or its to_plotly_json() dict, returns a plain dict
+    if hasattr(figure, "to_plotly_json"):
+        figure = figure.to_plotly_json()
+    layout = _slim_value(figure.get("layout", {}))
+    data = [_slim_trace(trace) for trace in figure.get("data", [])]
+    _hoist_shared(data, layout.setdefault("template", {}))
+    slim = {"data": data, "layout": layout}
+    if figure.get("frames"):
+        # Frame traces are merged onto the base traces, so they can't rely on the template
+        slim["frames"] = [
+            dict(frame, data=[_slim_trace(trace) for trace in frame.get("data", [])])
+            for frame in figure["frames"]
+        ]
+    return slim
+
+
+def figure_to_json(figure, key=None):
+    # Serialize a built figure, slimmed unless DASHBOARD_SLIM_FIGURES=0
+    if not SLIM_FIGURES:
+        return figure.to_json()
+    payload = json.dumps(slim_figure(figure), cls=PlotlyJSONEncoder, separators=(",", ":"))
+    if logger.isEnabledFor(logging.DEBUG) or (SLIM_SAMPLE_RATE and random.random() < SLIM_SAMPLE_RATE):
+        full = figure.to_json()
+        if key is not None:
+            with _stats_lock:
+                slim_stats[key] = (len(full), len(payload))
+        logger.debug("Slimmed figure %s from %d to %d bytes", key, len(full), len(payload))
+    return payload
+
+
+def slim_sizes():
+    # {(figure, "before" or "after"): bytes} for /metrics, from the sampled builds
+    with _stats_lock:
+        sizes = dict(slim_stats)
+    gauges = {}
+    for key, (before, after) in sizes.items():
+        figure = "/".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        gauges[(figure, "before")] = before
+        gauges[(figure, "after")] = after
+    return gauges
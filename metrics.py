@@ -0,0 +1,162 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# Latency and payload histograms served in the Prometheus text format from /metrics.
+# Values are per process: under gunicorn every worker reports its own, labelled
+# with its pid, and Prometheus sums them.
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** power for power in range(9))  # 1 KiB .. 64 MiB
+
+METRICS = {}
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self, extra):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            pairs = list(zip(self.labelnames, key)) + extra
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(pairs + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+
+class Gauge:
+    # Read at scrape time from read(), which returns a number or {label value: number}.
+    # With a tuple of label names the keys are tuples of label values.
+    def __init__(self, name, help, read, labelname=None, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labelname = labelname
+        self.kind = kind
+
+    def collect(self, extra):
+        value = self.read()
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = value.items() if isinstance(value, dict) else [(None, value)]
+        names = self.labelname if isinstance(self.labelname, tuple) else (self.labelname,)
+        for label, number in values:
+            labels = label if isinstance(label, tuple) else (label,)
+            pairs = (list(zip(names, labels)) if label is not None else []) + extra
+            lines.append(f"{self.name}{_labels(pairs)} {_number(number)}")
+        return lines
+
+
+def _register(metric):
+    with _lock:
+        return METRICS.setdefault(metric.name, metric)
+
+
+def histogram(name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, read, labelname=None, kind="gauge"):
+    return _register(Gauge(name, help, read, labelname, kind))
+
+
+def render():
+    extra = [("pid", os.getpid())]
+    lines = []
+    for name in sorted(METRICS):
+        lines.extend(METRICS[name].collect(extra))
+    return "\n".join(lines) + "\n"
+
+
+request_seconds = histogram(
+    "dashboard_request_seconds", "Time to handle an HTTP request or Dash callback.", ["endpoint"])
+response_bytes = histogram(
+    "dashboard_response_bytes", "Response body size before compression.", ["endpoint"], BYTES_BUCKETS)
+
+
+def _endpoint():
+    # Dash callbacks all share one URL, so they are told apart by their output
+    if request.path.endswith("/_dash-update-component"):
+        body = request.get_json(silent=True) or {}
+        return "callback:" + str(body.get("output", "?"))
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _record(response):
+    started = g.pop("metrics_started", None)
+    if started is None or request.path == "/metrics":
+        return response
+    endpoint = _endpoint()
+    request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+    if not response.direct_passthrough:
+        response_bytes.observe(len(response.get_data()), endpoint=endpoint)
+    return response
+
+
+def metrics_view():
+    return Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_metrics(server):
+    # Register after init_compression: after_request hooks run in reverse order,
+    # so sizes are recorded before the body is compressed
+    server.before_request(_start_timer)
+    server.after_request(_record)
+    server.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,110 @@
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+
+from gunicorn.app.base import BaseApplication
+
+logger = logging.getLogger(__name__)
+
+# python serve.py runs the dashboard under gunicorn. The datasets are loaded and
+# cleaned once in the master before it forks, so workers start warm and share
+# those pages copy-on-write. SIGHUP replaces workers gracefully, SIGTERM drains
+# in-flight requests for up to DASHBOARD_GRACEFUL_TIMEOUT seconds.
+BIND = os.environ.get("DASHBOARD_BIND", "0.0.0.0:8000")
+WORKERS = int(os.environ.get("DASHBOARD_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+THREADS = int(os.environ.get("DASHBOARD_THREADS", "4"))
+TIMEOUT = int(os.environ.get("DASHBOARD_TIMEOUT", "60"))
+GRACEFUL_TIMEOUT = int(os.environ.get("DASHBOARD_GRACEFUL_TIMEOUT", "30"))
+# Recycle workers after this many requests (0 = never), jittered so they don't restart together
+MAX_REQUESTS = int(os.environ.get("DASHBOARD_MAX_REQUESTS", "0"))
+# Workers map the datasets from Arrow files instead of each holding its own copy
+ARROW_SNAPSHOTS = os.environ.get("DASHBOARD_ARROW_SNAPSHOTS", "1") != "0"
+
+# Set in the master by warm_master()
+store = None
+publisher_pid = None
+
+
+def warm_master():
+    # Runs once in the master, before any worker exists
+    global store, publisher_pid
+    from aggregates import materialise
+    from datasets import SERVED, WATCH_INTERVAL, registry
+
+    registry.warm(SERVED)
+    if ARROW_SNAPSHOTS:
+        from arrow_snapshot import SnapshotStore, start_publisher
+
+        store = SnapshotStore()
+        store.publish(registry.snapshot())
+        # The publisher keeps the parsing loaders, the master and workers map
+        publisher_pid = start_publisher(store, registry, WATCH_INTERVAL)
+        store.attach(registry)
+        registry.warm(SERVED)
+    materialise(registry.snapshot())
+    registry.on_reload(materialise)
+    # Objects created so far are never collected, so the collector doesn't
+    # write to their pages and break sharing with the workers
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded snapshot %d in the master", registry.snapshot().version)
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so each worker starts its own watcher: of the
+    # published snapshot when mapping, of the CSVs otherwise
+    from datasets import WATCH_INTERVAL, registry
+
+    if store is not None:
+        store.follow(registry, WATCH_INTERVAL)
+    else:
+        registry.watch()
+
+
+def on_exit(server):
+    if publisher_pid is not None:
+        try:
+            os.kill(publisher_pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+class DashboardApplication(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app import server
+
+        warm_master()
+        return server
+
+
+def options():
+    return {
+        "bind": BIND,
+        "workers": WORKERS,
+        "threads": THREADS,
+        "worker_class": "gthread" if THREADS > 1 else "sync",
+        "preload_app": True,
+        "timeout": TIMEOUT,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS // 10,
+        "post_fork": post_fork,
+        "on_exit": on_exit,
+        "accesslog": "-",
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    DashboardApplication(options()).run()
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Box and violin figures drawn from per-group summaries computed here, so the
+# payload grows with the number of groups instead of the number of rows.
+
+WHISKER = 1.5
+# Outliers sent per group, most extreme first
+MAX_OUTLIERS = 50
+# Evaluation points per violin curve, and the bins values are counted into first
+KDE_POINTS = 64
+KDE_BINS = 128
+
+
+def distribution_stats(frame, value, by, kde=False):
+    # Quartiles, mean, whisker ends and outliers per group of `by` (a list of
+    # columns), plus KDE curves on a per-group grid when kde=True.
+    frame = frame.dropna(subset=[value])
+    grouped = frame.groupby(by, observed=True, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    values = frame[value].to_numpy(dtype=np.float64)
+
+    stats = grouped[value].quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    aggregated = grouped[value].agg(["mean", "count", "std", "min", "max"])
+    stats = stats.join(aggregated)
+
+    iqr = (stats["q3"] - stats["q1"]).to_numpy()
+    low = stats["q1"].to_numpy() - WHISKER * iqr
+    high = stats["q3"].to_numpy() + WHISKER * iqr
+    inside = (values >= low[codes]) & (values <= high[codes])
+    fences = frame[inside].groupby(by, observed=True, sort=True)[value].agg(["min", "max"])
+    stats["lowerfence"] = fences["min"]
+    stats["upperfence"] = fences["max"]
+    outliers = frame.loc[~inside, by + [value]]
+    distance = np.abs(values[~inside] - stats["median"].to_numpy()[codes[~inside]])
+    order = np.lexsort((-distance, codes[~inside]))
+    rank = outliers.iloc[order].groupby(by, observed=True, sort=False).cumcount().to_numpy()
+    outliers = outliers.iloc[order[rank < MAX_OUTLIERS]]
+    if not kde:
+        return stats, outliers
+
+    grid, density = _kde(values, codes, stats, iqr)
+    return stats, outliers, grid, density
+
+
+def _kde(values, codes, stats, iqr):
+    # Gaussian KDE of every group at once: values are counted into KDE_BINS bins
+    # per group, then the bin counts are smoothed onto KDE_POINTS grid points.
+    count = stats["count"].to_numpy(dtype=np.float64)
+    std = stats["std"].fillna(0).to_numpy()
+    low, high = stats["min"].to_numpy(), stats["max"].to_numpy()
+    # Silverman's rule, the same bandwidth plotly.js uses for violins
+    spread = np.where(iqr > 0, np.minimum(std, iqr / 1.349), std)
+    bandwidth = 1.059 * spread * count ** -0.2
+    bandwidth = np.where(bandwidth > 0, bandwidth, np.nan)
+
+    width = (high - low) / KDE_BINS
+    width = np.where(width > 0, width, 1.0)
+    bins = np.clip(((values - low[codes]) / width[codes]).astype(np.int64), 0, KDE_BINS - 1)
+    counts = np.bincount(codes * KDE_BINS + bins, minlength=len(stats) * KDE_BINS).reshape(len(stats), KDE_BINS)
+    centers = low[:, None] + (np.arange(KDE_BINS) + 0.5) * width[:, None]
+
+    # Curves extend two bandwidths past the data, like plotly's "soft" span
+    start, stop = low - 2 * bandwidth, high + 2 * bandwidth
+    grid = start[:, None] + (stop - start)[:, None] * np.linspace(0, 1, KDE_POINTS)
+    z = (grid[:, None, :] - centers[:, :, None]) / bandwidth[:, None, None]
+    kernel = np.exp(-0.5 * z ** 2)
+    density = (counts[:, :, None] * kernel).sum(axis=1) / (count * bandwidth * np.sqrt(2 * np.pi))[:, None]
+    # Groups with a single distinct value get no curve, only their box
+    return grid, density
+
+
+def _colors(names):
+    palette = qualitative.Plotly
+    return {name: palette[index % len(palette)] for index, name in enumerate(names)}
+
+
+def _series(table, color):
+    # (legend name, rows) per colour, or a single unnamed series
+    if color is None:
+        return [(None, table)]
+    return list(table.groupby(color, observed=True, sort=False))
+
+
+def _axis_titles(fig, x, value, labels):
+    labels = labels or {}
+    fig.update_layout(
+        xaxis_title=labels.get(x, x) if x else None,
+        yaxis_title=labels.get(value, value),
+    )
+
+
+def box_figure(frame, value, x=None, color=None, title=None, labels=None, template="plotly_dark"):
+    # px.box look-alike: one box trace per colour with precomputed quartiles and
+    # fences, plus a marker trace carrying only the outliers
+    by = list(dict.fromkeys(column for column in (x, color) if column))
+    stats, outliers = distribution_stats(frame, value, by)
+    table = stats.reset_index()
+    series = _series(table, color)
+    colors = _colors([name for name, _ in series])
+    grouped = len(by) == 2
+
+    fig = go.Figure()
+    for name, rows in series:
+        label = str(name) if name is not None else value
+        positions = rows[x] if x else [label] * len(rows)
+        fig.add_trace(go.Box(
+            x=positions,
+            q1=rows["q1"], median=rows["median"], q3=rows["q3"], mean=rows["mean"],
+            lowerfence=rows["lowerfence"], upperfence=rows["upperfence"],
+            name=label,
+            legendgroup=label,
+            offsetgroup=label if grouped else None,
+            marker_color=colors[name],
+            showlegend=color is not None,
+        ))
+        points = outliers if name is None else outliers[outliers[color] == name]
+        if len(points):
+            fig.add_trace(go.Scatter(
+                x=points[x] if x else [label] * len(points),
+                y=points[value],
+                mode="markers",
+                name=label,
+                legendgroup=label,
+                offsetgroup=label if grouped else None,
+                marker_color=colors[name],
+                showlegend=False,
+                hovertemplate=f"{label}<br>{value}=%{{y}}<extra></extra>",
+            ))
+    fig.update_layout(title=title, template=template,
+                      boxmode="group" if grouped else "overlay",
+                      scattermode="group" if grouped else "overlay")
+    _axis_titles(fig, x, value, labels)
+    return fig
+
+
+def violin_figure(frame, value, x=None, color=None, title=None, labels=None, template="plotly_dark"):
+    # px.violin(box=True) look-alike: each violin is a filled outline of its KDE
+    # curve, drawn around a numeric slot position, with a slim precomputed box inside
+    by = list(dict.fromkeys(column for column in (x, color) if column))
+    stats, outliers, grid, density = distribution_stats(frame, value, by, kde=True)
+    table = stats.reset_index()
+    table["_row"] = np.arange(len(table))
+    series = _series(table, color)
+    colors = _colors([name for name, _ in series])
+
+    # Slot positions: numeric x stays as is, categories get 0..n-1 with tick labels
+    axis = x or color
+    categories = None
+    if pd.api.types.is_numeric_dtype(table[axis]):
+        base = table[axis].to_numpy(dtype=np.float64)
+        step = np.min(np.diff(np.unique(base))) if table[axis].nunique() > 1 else 1.0
+    else:
+        categories = list(dict.fromkeys(table[axis]))
+        slot_of = {category: index for index, category in enumerate(categories)}
+        base = table[axis].astype(object).map(slot_of).to_numpy(dtype=np.float64)
+        step = 1.0
+    slots = len(series) if len(by) == 2 else 1
+    half = 0.4 * step / slots
+
+    fig = go.Figure()
+    for slot, (name, rows) in enumerate(series):
+        label = str(name) if name is not None else value
+        offset = (slot - (slots - 1) / 2) * 2 * half if slots > 1 else 0.0
+        positions = base[rows["_row"].to_numpy()] + offset
+        outline_x, outline_y = [], []
+        for row, position in zip(rows["_row"], positions):
+            curve = density[row]
+            if not np.all(np.isfinite(curve)) or curve.max() <= 0:
+                continue
+            curve = curve / curve.max() * half
+            outline_x.extend(np.concatenate([position + curve, (position - curve)[::-1]]).tolist() + [None])
+            outline_y.extend(np.concatenate([grid[row], grid[row][::-1]]).tolist() + [None])
+        fig.add_trace(go.Scatter(
+            x=outline_x, y=outline_y,
+            mode="lines", fill="toself",
+            line=dict(color=colors[name], width=1),
+            name=label, legendgroup=label,
+            showlegend=color is not None,
+            hoverinfo="skip",
+        ))
+        fig.add_trace(go.Box(
+            x=positions,
+            q1=rows["q1"], median=rows["median"], q3=rows["q3"], mean=rows["mean"],
+            lowerfence=rows["lowerfence"], upperfence=rows["upperfence"],
+            width=half / 2,
+            name=label, legendgroup=label,
+            marker_color=colors[name],
+            showlegend=False,
+        ))
+        points = outliers if name is None else outliers[outliers[color] == name]
+        if len(points):
+            if categories is None:
+                point_positions = points[axis].to_numpy(dtype=np.float64) + offset
+            else:
+                point_positions = points[axis].astype(object).map(slot_of).to_numpy(dtype=np.float64) + offset
+            fig.add_trace(go.Scatter(
+                x=point_positions, y=points[value],
+                mode="markers",
+                name=label, legendgroup=label,
+                marker_color=colors[name],
+                showlegend=False,
+                hovertemplate=f"{label}<br>{value}=%{{y}}<extra></extra>",
+            ))
+    fig.update_layout(title=title, template=template, boxmode="overlay")
+    if categories is not None:
+        fig.update_xaxes(tickvals=list(range(len(categories))), ticktext=[str(category) for category in categories])
+    _axis_titles(fig, x, value, labels)
+    return fig
+
+
+def histogram_counts(values, nbins, value_range=None):
+    # numpy.histogram over the finite values, optionally only those inside value_range
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if value_range is not None:
+        values = values[(values >= value_range[0]) & (values <= value_range[1])]
+    return np.histogram(values, bins=nbins, range=value_range)
+
+
+def histogram_figure(counts, edges, x, title=None, labels=None, template="plotly_dark"):
+    # px.histogram look-alike from precomputed counts: one bar per bin, spanning its edges
+    label = (labels or {}).get(x, x)
+    fig = go.Figure(go.Bar(
+        x=edges[:-1],
+        y=counts,
+        width=np.diff(edges),
+        offset=0,
+        customdata=edges[1:],
+        marker_color=qualitative.Plotly[0],
+        hovertemplate=f"{label}=%{{x}} - %{{customdata}}<br>count=%{{y}}<extra></extra>",
+    ))
+    fig.update_layout(title=title, template=template, bargap=0, xaxis_title=label, yaxis_title="count")
+    return fig
@@ -0,0 +1,42 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+# Synthetic benchmark data shared by the test modules. Project modules read their
+# DASHBOARD_* settings at import, so the data is generated and used only in
+# subprocesses started with those settings. The pytest process itself never
+# imports data_loader, and no test can pin another one to ./data.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The project modules live at the repository root, which plain `pytest` (unlike
+# `python -m pytest`) doesn't put on sys.path
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+BUDGETS_PATH = os.environ.get("DASHBOARD_TAB_BUDGETS", os.path.join(ROOT, "tests", "tab_budgets.json"))
+
+with open(BUDGETS_PATH) as handle:
+    BUDGETS = json.load(handle)
+
+
+@pytest.fixture(scope="session")
+def synthetic():
+    # {"env": environment pointing at the data, "rows": generated rows per CSV}
+    directory = tempfile.mkdtemp(prefix="dashboard-tests-")
+    generate = ("import json, sys; from benchmarks.synthetic import generate; "
+                "json.dump(generate(sys.argv[1], int(sys.argv[2]), int(sys.argv[3])), sys.stdout)")
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-c", generate, directory, str(BUDGETS["scale"]), str(BUDGETS["seed"])],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        env = dict(os.environ,
+                   DASHBOARD_DATA_DIR=directory,
+                   DASHBOARD_CACHE_DIR=os.path.join(directory, ".cache"),
+                   DASHBOARD_ARTIFACTS_DIR=os.path.join(directory, "artifacts"))
+        yield {"env": env, "rows": json.loads(completed.stdout)}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import AGREE, MAD_SCALE, MIN_PERIODS, ROBUST_THRESHOLD, SCORES, WINDOW, ZSCORE_THRESHOLD, anomaly_scores
+from conftest import ROOT
+
+# The vectorised anomaly engine against a plain per-country groupby/rolling
+# reference, and the share of the shipped migration data it flags.
+MIGRATION_PATH = os.path.join(ROOT, "data", "pop_and_net_migration.csv")
+
+
+@pytest.fixture(scope="module")
+def migration():
+    return pd.read_csv(MIGRATION_PATH)
+
+
+def robust_reference(values):
+    median = values.median()
+    mad = (values - median).abs().median()
+    return MAD_SCALE * (values - median) / mad if mad > 0 else values * np.nan
+
+
+def reference_scores(frame, value):
+    parts = []
+    for _, group in frame.groupby("Country"):
+        group = group.sort_values("Year")
+        values = group[value].astype(float)
+        earlier = values.shift(1).rolling(WINDOW, min_periods=MIN_PERIODS)
+        std = earlier.std()
+        jumps = values.diff() / group["Year"].astype(float).diff()
+        parts.append(pd.DataFrame({
+            "rolling_z": ((values - earlier.mean()) / std).where(std > 0),
+            "robust": robust_reference(values),
+            "jump": robust_reference(jumps),
+        }))
+    return pd.concat(parts).loc[frame.index]
+
+
+@pytest.mark.parametrize("value", ["net_migration", "total_population"])
+def test_matches_groupby_reference(migration, value):
+    scores = anomaly_scores(migration, value)
+    reference = reference_scores(migration, value)
+    for score in SCORES:
+        np.testing.assert_allclose(scores[score], reference[score], rtol=1e-9, atol=1e-9, equal_nan=True)
+    over = np.abs(reference[SCORES].to_numpy()) > [ZSCORE_THRESHOLD, ROBUST_THRESHOLD, ROBUST_THRESHOLD]
+    np.testing.assert_array_equal(scores["anomaly"], over.sum(axis=1) >= AGREE)
+
+
+def test_row_order_does_not_matter(migration):
+    shuffled = migration.sample(frac=1, random_state=0)
+    pd.testing.assert_frame_equal(anomaly_scores(shuffled, "net_migration").loc[migration.index],
+                                  anomaly_scores(migration, "net_migration"))
+
+
+def test_flags_a_few_years(migration):
+    # Unusual years only: some, but no more than one in twenty
+    flagged = int(anomaly_scores(migration, "net_migration")["anomaly"].sum())
+    assert 0 < flagged <= 0.05 * len(migration), f"{flagged} of {len(migration)} rows flagged"
+
+
+def test_flags_a_planted_spike():
+    rng = np.random.default_rng(0)
+    years = np.arange(1960, 2020)
+    frame = pd.DataFrame({
+        "Country": np.repeat(["A", "B"], len(years)),
+        "Year": np.tile(years, 2),
+        "value": rng.normal(1000, 10, 2 * len(years)),
+    })
+    frame.loc[30, "value"] = 5000
+    flagged = anomaly_scores(frame, "value")["anomaly"]
+    assert flagged[30]
+    assert flagged.sum() <= 3
@@ -0,0 +1,86 @@
+import gzip
+
+import pytest
+from flask import Flask, Response
+
+import compression
+from compression import COMPRESS_MIN_BYTES, choose_encoding, init_compression
+
+# Accept-Encoding negotiation and the cases compress_response leaves alone.
+BODY = b'{"figure": [' + b"1234567890," * 400 + b"0]}"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.2, gzip;q=0.8", "gzip"),
+    ("br;q=0.8, gzip;q=0.8", "br"),
+    ("GZIP ; Q=0.5", "gzip"),
+    ("gzip;level=1;q=0", None),
+    ("gzip;q=abc", None),
+    ("identity;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("*;q=0.5, br;q=0", "gzip"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, gzip;q=0.1") == "gzip"
+    assert choose_encoding("br") is None
+
+
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+    init_compression(server)
+
+    @server.route("/json")
+    def json_body():
+        return Response(BODY, mimetype="application/json")
+
+    @server.route("/small")
+    def small_body():
+        return Response(BODY[:COMPRESS_MIN_BYTES - 1], mimetype="application/json")
+
+    @server.route("/encoded")
+    def encoded_body():
+        return Response(gzip.compress(BODY), mimetype="application/json", headers={"Content-Encoding": "gzip"})
+
+    @server.route("/image")
+    def image_body():
+        return Response(BODY, mimetype="image/png")
+
+    return server.test_client()
+
+
+def test_compresses_json(client):
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/image"])
+def test_skips_small_and_binary_bodies(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert "Content-Encoding" not in response.headers
+    assert len(response.get_data()) == (COMPRESS_MIN_BYTES - 1 if path == "/small" else len(BODY))
+
+
+def test_leaves_encoded_bodies_alone(client):
+    response = client.get("/encoded", headers={"Accept-Encoding": "br"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_uncompressed_without_accept_encoding(client):
+    response = client.get("/json")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == BODY
@@ -0,0 +1,60 @@
+import base64
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+from dash import Dash, dcc
+
+from figure_slim import (PLOTLYJS_HEADER, TYPED_ARRAYS, TYPED_ARRAYS_PLOTLYJS, TYPED_ARRAY_MIN_LENGTH,
+                         figure_to_json, served_plotlyjs_version)
+
+# Slimmed figures against the plotly.js the installed dash actually serves: typed
+# arrays only when that plotly.js can decode them, and their bdata decoding to
+# the values that were plotted.
+DTYPES = {"i1": "<i1", "u1": "<u1", "i2": "<i2", "u2": "<u2", "i4": "<i4", "u4": "<u4", "f8": "<f8"}
+
+
+def decode(value):
+    # The typed-array spec as plotly.js reads it: little-endian base64 of dtype
+    if isinstance(value, dict) and "bdata" in value:
+        return np.frombuffer(base64.b64decode(value["bdata"]), dtype=DTYPES[value["dtype"]]).tolist()
+    return value
+
+
+@pytest.fixture(scope="module")
+def served_version():
+    # Read from the plotly.min.js a Dash app really serves to the browser
+    app = Dash(__name__)
+    app.layout = dcc.Graph(id="graph")
+    client = app.server.test_client()
+    scripts = [resource for resource in dcc._js_dist if resource.get("relative_package_path", "").endswith("plotly.min.js")]
+    assert scripts, "dash serves no plotly.js"
+    resource = scripts[-1]
+    response = client.get(f"/_dash-component-suites/{resource['namespace']}/{resource['relative_package_path']}")
+    assert response.status_code == 200
+    match = PLOTLYJS_HEADER.search(response.get_data()[:512])
+    return int(match.group(1)), int(match.group(2))
+
+
+def test_detects_the_served_plotlyjs(served_version):
+    assert served_plotlyjs_version() == served_version
+
+
+def test_typed_arrays_match_served_plotlyjs(served_version):
+    if TYPED_ARRAYS:
+        assert served_version >= TYPED_ARRAYS_PLOTLYJS
+
+
+def test_bdata_decodes_to_the_plotted_values():
+    years = list(range(1960, 2024))
+    counts = [(year - 1950) * 1000 for year in years]
+    rates = [round(0.1 + index / 7, 4) for index in range(len(years))]
+    figure = go.Figure([go.Scatter(x=years, y=counts), go.Bar(x=years, y=rates)])
+    slim = json.loads(figure_to_json(figure))
+    assert len(years) >= TYPED_ARRAY_MIN_LENGTH
+
+    decoded = [{key: decode(trace[key]) for key in ("x", "y")} for trace in slim["data"]]
+    assert decoded == [{"x": years, "y": counts}, {"x": years, "y": rates}]
+    encoded = any(isinstance(trace[key], dict) for trace in slim["data"] for key in ("x", "y"))
+    assert encoded == TYPED_ARRAYS
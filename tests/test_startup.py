@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+# Time to first request of a fresh process on the synthetic benchmark data,
+# against DASHBOARD_STARTUP_TARGET, and the heavy imports that must stay deferred.
+
+
+@pytest.fixture(scope="module")
+def report(synthetic):
+    # The first run fills the dataset cache, the second is a regular restart
+    for _ in range(2):
+        completed = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--json", "--no-imports"],
+                                   cwd=ROOT, env=synthetic["env"], capture_output=True, text=True)
+        assert completed.stdout, completed.stderr
+    return json.loads(completed.stdout)
+
+
+def test_time_to_first_request(report):
+    assert report["within_target"], (
+        f"first request after {report['time_to_first_request']:.3f}s, target {report['target']}s: {report['phases']}")
+
+
+def test_heavy_imports_deferred(report):
+    imported = [name for name, loaded in report["deferred_imported"].items() if loaded]
+    assert not imported, f"imported at startup: {imported}"
@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import BUDGETS, ROOT
+
+# Payload and latency budgets per dashboard tab. Every tab is clicked through
+# Dash's callback dispatch (update_tab plus the graph callbacks it mounts) against
+# synthetic benchmark data, and the test fails when a tab outgrows its entry in
+# tab_budgets.json. Point DASHBOARD_TAB_BUDGETS at another file to use other budgets.
+# The clicks run in a fresh interpreter (this file run as a script) pointed at the data.
+TABS = ["overview", "refugees", "migration", "slavery", "war"]
+
+
+def measure():
+    # Runs in the subprocess: rows of every loaded dataset and each tab's sizes and time
+    sys.path.insert(0, ROOT)
+    import app
+    from benchmarks.run import render_tab
+    from data_loader import SOURCES
+    from datasets import registry
+    from figure_cache import figure_cache
+
+    client = app.server.test_client()
+    tabs = {}
+    for tab in TABS:
+        # Warm the datasets and aggregates so only the tab itself is timed
+        render_tab(client, tab)
+        figure_cache.clear()
+        started = time.perf_counter()
+        sizes = render_tab(client, tab)
+        tabs[tab] = dict(sizes, seconds=time.perf_counter() - started)
+    rows = {name: len(registry.get(name)) for name in SOURCES}
+    return {"rows": rows, "tabs": tabs}
+
+
+@pytest.fixture(scope="module")
+def measured(synthetic):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__)],
+                               cwd=ROOT, env=synthetic["env"], capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout)
+
+
+def test_every_tab_has_a_budget():
+    assert sorted(BUDGETS["tabs"]) == sorted(TABS)
+
+
+def test_measured_the_synthetic_data(synthetic, measured):
+    # Fails loudly if the harness ever loads ./data instead
+    assert measured["rows"] == synthetic["rows"]
+
+
+@pytest.mark.parametrize("tab", TABS)
+def test_tab_within_budget(measured, tab):
+    budget = BUDGETS["tabs"][tab]
+    sizes = measured["tabs"][tab]
+
+    assert sizes["update_tab"] <= budget["update_tab_bytes"], (
+        f"{tab}: update_tab response is {sizes['update_tab']} bytes, budget {budget['update_tab_bytes']}")
+    assert sizes["total"] <= budget["total_bytes"], (
+        f"{tab}: tab and graph callbacks send {sizes['total']} bytes, budget {budget['total_bytes']}")
+    assert sizes["seconds"] <= budget["seconds"], f"{tab}: took {sizes['seconds']:.3f}s, budget {budget['seconds']}s"
+
+
+if __name__ == "__main__":
+    json.dump(measure(), sys.stdout)